@@ -1,7 +1,21 @@
+import functools
+import hashlib
+import logging
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
 import numpy
 import pyproj
+import h5py
+try:
+    import tomllib
+except ImportError: # python < 3.11
+    import tomli as tomllib
 
 import astropy.constants as const
+import astropy.units as units
 from astropy.coordinates import SkyCoord
 from astropy.time import Time
 
@@ -9,36 +23,211 @@ import erfa
 
 
 def degrees_process(value):
+    if isinstance(value, (list, tuple, numpy.ndarray)):
+        return _degrees_process_array(value)
     if isinstance(value, str):
         if value.count(':') == 2:
+            sign = -1.0 if value.strip().startswith('-') else 1.0
             value = value.split(':')
-            return float(value[0]) + (float(value[1]) + float(value[2])/60)/60
+            return sign*(abs(float(value[0])) + (float(value[1]) + float(value[2])/60)/60)
         return float(value)
     return float(value)
 
-def transform_antenna_positions_xyz_to_ecef(longitude, latitude, altitude, antenna_positions):
-    transformer = pyproj.Proj.from_proj(
-        pyproj.Proj(proj='latlong', ellps='WGS84', datum='WGS84'),
-        pyproj.Proj(proj='geocent', ellps='WGS84', datum='WGS84'),
+def _degrees_process_array(values):
+    """`degrees_process` of an array of values, with vectorized parsing of
+    sexagesimal ('d:m:s') and decimal strings. Values that
+    `degrees_process` rejects are rejected likewise (ValueError)."""
+    values = numpy.asarray(values)
+    if values.dtype.kind in 'iuf':
+        return values.astype(numpy.float64)
+
+    strings = numpy.char.strip(values.astype(str))
+    colons = numpy.char.count(strings, ':')
+    malformed = (colons != 0) & (colons != 2)
+    if malformed.any():
+        raise ValueError(f"could not convert string to float: '{strings[malformed].flat[0]}'")
+    sexagesimal = colons == 2
+    degrees, _, minutes_seconds = numpy.moveaxis(numpy.char.partition(strings, ':'), -1, 0)
+    minutes, _, seconds = numpy.moveaxis(numpy.char.partition(minutes_seconds, ':'), -1, 0)
+    # only the decimal values lack minutes and seconds, empty sexagesimal
+    # fields fail to convert as they do in `degrees_process`
+    minutes = numpy.where(sexagesimal, minutes, '0').astype(numpy.float64)
+    seconds = numpy.where(sexagesimal, seconds, '0').astype(numpy.float64)
+    sign = numpy.where(numpy.char.startswith(degrees, '-'), -1.0, 1.0)
+    return sign*(numpy.abs(degrees.astype(numpy.float64)) + (minutes + seconds/60)/60)
+
+@functools.lru_cache(maxsize=None)
+def _get_geocentric_transformer(ellps='WGS84', datum='WGS84'):
+    """Returns the (cached) longitude-latitude to geocentric transformer."""
+    return pyproj.Transformer.from_crs(
+        pyproj.CRS(proj='latlong', ellps=ellps, datum=datum),
+        pyproj.CRS(proj='geocent', ellps=ellps, datum=datum),
+        always_xy=True,
     )
-    telescopeCenterXyz = transformer.transform(
+
+def transform_antenna_positions_xyz_to_ecef(longitude, latitude, altitude, antenna_positions, ellps='WGS84', datum='WGS84'):
+    telescopeCenterXyz = _get_geocentric_transformer(ellps, datum).transform(
         longitude,
         latitude,
         altitude,
     )
-    for i in range(antenna_positions.shape[0]):
-        antenna_positions[i, :] -= telescopeCenterXyz
+    antenna_positions -= numpy.array(telescopeCenterXyz)
+
+_TELINFO_CACHE = {}
+
+def load_telinfo_antenna_positions(telinfo_filepath):
+    """Loads the antennas of a telescope-information TOML file (as produced
+    by `stage_bfr5_generate.dump_telescope_info`).
+
+    Positions in the `ecef` frame are made relative to the telescope
+    reference point with `transform_antenna_positions_xyz_to_ecef`,
+    positions in the `xyz` frame are taken to be relative already.
+    The result is cached per file and reused while the file's
+    modification time and size are unchanged.
+
+    Returns:
+        dict with "longitude", "latitude" (degrees), "altitude" (metres),
+        "antenna_names", "antenna_numbers" and
+        "antenna_positions" (numpy.ndarray [Antenna, XYZ]), which is a
+        copy the caller may modify.
+    """
+    telinfo_filepath = os.path.abspath(telinfo_filepath)
+    stat = os.stat(telinfo_filepath)
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _TELINFO_CACHE.get(telinfo_filepath)
+    if cached is None or cached[0] != signature:
+        with open(telinfo_filepath, "rb") as fio:
+            telinfo = tomllib.load(fio)
+
+        longitude = degrees_process(telinfo["longitude"])
+        latitude = degrees_process(telinfo["latitude"])
+        altitude = float(telinfo["altitude"])
+        antenna_positions = numpy.array(
+            [antenna["position"] for antenna in telinfo["antennas"]],
+            dtype=numpy.float64
+        ).reshape(-1, 3)
+
+        frame = telinfo.get("antenna_position_frame", "ecef").lower()
+        if frame == "ecef":
+            transform_antenna_positions_xyz_to_ecef(longitude, latitude, altitude, antenna_positions)
+        elif frame != "xyz":
+            raise ValueError(f"Unsupported antenna_position_frame: '{frame}'.")
+
+        cached = (
+            signature,
+            {
+                "longitude": longitude,
+                "latitude": latitude,
+                "altitude": altitude,
+                "antenna_names": [antenna["name"] for antenna in telinfo["antennas"]],
+                "antenna_numbers": [antenna["number"] for antenna in telinfo["antennas"]],
+                "antenna_positions": antenna_positions,
+            }
+        )
+        _TELINFO_CACHE[telinfo_filepath] = cached
+
+    telinfo = dict(cached[1])
+    telinfo["antenna_names"] = list(telinfo["antenna_names"])
+    telinfo["antenna_numbers"] = list(telinfo["antenna_numbers"])
+    telinfo["antenna_positions"] = telinfo["antenna_positions"].copy()
+    return telinfo
+
+@functools.lru_cache(maxsize=4096)
+def _get_astrom(jd, longitude, latitude, altitude, dut1=0.0):
+    """Returns the eraASTROM context for the UTC Julian Date and site.
+
+    Every source observed at the same instant from the same site shares
+    the context, so it is cached on (jd, lla, dut1). The returned
+    context must not be modified.
+    """
+    astrom, eo = erfa.apco13(
+        jd, 0,
+        dut1,
+        longitude, latitude, altitude,
+        0, 0,
+        0, 0, 0, 0
+    )
+    return astrom
+
+def _get_astroms(jds, lla, dut1=0.0, refreshInterval_s=None):
+    """Returns the eraASTROM contexts for each UTC Julian Date.
 
-def _compute_ha_dec_with_astrom(astrom, radec):
-    """Computes UVW antenna coordinates with respect to reference
     Args:
-        radec: SkyCoord
-    
+        jds: numpy.ndarray UTC Julian Dates
+        lla: tuple Reference Coordinates (radians)
+            Longitude, Latitude, Altitude.
+        dut1: float UT1-UTC (seconds)
+        refreshInterval_s: float
+            If None, each context is fully set up (erfa.apco13). Otherwise
+            a context is fully set up at most every refreshInterval_s
+            (numpy.inf for once) and the contexts in between are refreshed
+            for the Earth rotation angle alone (erfa.aper13). The
+            ephemerides, precession-nutation and diurnal aberration are
+            then held from the setup time, see `astrometry_refresh_error`.
+
     Returns:
-        (ra=Hour-Angle, dec=Declination, unit='rad')
+        numpy.ndarray of eraASTROM, shaped as jds
+    """
+    jds = numpy.asarray(jds, dtype=numpy.float64)
+    if refreshInterval_s is None:
+        return numpy.array(
+            [_get_astrom(float(jd), *lla, dut1) for jd in jds.ravel()],
+            dtype=erfa.dt_eraASTROM
+        ).reshape(jds.shape)
+
+    jds_flat = jds.ravel()
+    astroms = numpy.empty(jds_flat.shape, dtype=erfa.dt_eraASTROM)
+    setup_jd = None
+    for i, jd in enumerate(jds_flat):
+        if setup_jd is None or abs(jd - setup_jd)*86400 > refreshInterval_s:
+            setup_jd = float(jd)
+            setup_astrom = _get_astrom(setup_jd, *lla, dut1)
+        astroms[i] = setup_astrom
+
+    ut11, ut12 = erfa.utcut1(jds_flat, 0, dut1)
+    return erfa.aper13(ut11, ut12, astroms).reshape(jds.shape)
+
+def _skycoord_radec_rad(coordinates):
+    """Returns (ra, dec) radian arrays of a SkyCoord or a sequence of SkyCoords."""
+    if isinstance(coordinates, SkyCoord):
+        return coordinates.ra.rad, coordinates.dec.rad
+    return (
+        numpy.array([coord.ra.rad for coord in coordinates], dtype=numpy.float64),
+        numpy.array([coord.dec.rad for coord in coordinates], dtype=numpy.float64),
+    )
+
+def beam_grid(centreCoordinate, spacing_deg, shape):
+    """Returns the coordinates of a raster of beams about a centre
+
+    Args:
+        centreCoordinate: SkyCoord
+        spacing_deg: float or (float, float)
+            The (longitude, latitude) offset between neighbouring beams,
+            measured on the sky.
+        shape: (int, int)
+            The number of beams along (longitude, latitude).
+
+    Returns:
+        SkyCoord array of shape[0]*shape[1] beams, longitude varying fastest
+    """
+    spacing_lon, spacing_lat = numpy.broadcast_to(numpy.asarray(spacing_deg, dtype=numpy.float64), (2,))
+    offsets_lon = (numpy.arange(shape[0]) - (shape[0]-1)/2)*spacing_lon
+    offsets_lat = (numpy.arange(shape[1]) - (shape[1]-1)/2)*spacing_lat
+    offsets_lat, offsets_lon = numpy.meshgrid(offsets_lat, offsets_lon, indexing='ij')
+    return centreCoordinate.spherical_offsets_by(
+        offsets_lon.ravel()*units.deg,
+        offsets_lat.ravel()*units.deg,
+    )
+
+def _compute_ha_dec_rad_with_astrom(astrom, ra_rad, dec_rad):
+    """Computes the observed hour-angle and declination of ICRS ra/dec (radians)
+
+    Returns:
+        (Hour-Angle, Declination), broadcast from ra_rad, dec_rad and astrom
     """
     ri, di = erfa.atciq(
-        radec.ra.rad, radec.dec.rad,
+        ra_rad, dec_rad,
         0, 0, 0, 0,
         astrom
     )
@@ -48,6 +237,101 @@ def _compute_ha_dec_with_astrom(astrom, radec):
     )
     return ha, dec
 
+def _compute_ha_dec_with_astrom(astrom, radec):
+    """Computes UVW antenna coordinates with respect to reference
+    Args:
+        radec: SkyCoord (scalar or array) or sequence of SkyCoord
+    
+    Returns:
+        (ra=Hour-Angle, dec=Declination, unit='rad'), shaped as radec
+    """
+    return _compute_ha_dec_rad_with_astrom(astrom, *_skycoord_radec_rad(radec))
+
+def compute_ha_dec(ts, coordinates, lla, dut1=0.0):
+    """Computes the hour-angle and declination of all coordinates at once
+
+    Args:
+        ts: Time (scalar)
+        coordinates: SkyCoord (scalar or array) or sequence of SkyCoord
+        lla: tuple Reference Coordinates (radians)
+            Longitude, Latitude, Altitude.
+        dut1: float UT1-UTC (seconds)
+
+    Returns:
+        (Hour-Angle, Declination) in radians, shaped as coordinates
+    """
+    astrom = _get_astrom(float(ts.jd), *lla, dut1)
+    return _compute_ha_dec_with_astrom(astrom, coordinates)
+
+def astrometry_refresh_error(times, coordinates, lla, dut1=0.0, refreshInterval_s=numpy.inf):
+    """Measures the error of refreshed astrometry against the full setup
+
+    Args:
+        times: numpy.ndarray [unix]
+        coordinates: SkyCoord (scalar or array) or sequence of SkyCoord
+        lla: tuple Reference Coordinates (radians)
+            Longitude, Latitude, Altitude.
+        dut1: float UT1-UTC (seconds)
+        refreshInterval_s: float, as for `_get_astroms`
+
+    Returns:
+        (Hour-Angle, Declination) maximum absolute errors in radians.
+        A baseline of length L metres incurs a delay error of at most
+        L*error/c, less where beam and boresight errors are common.
+    """
+    jds = Time(times, format='unix').jd
+    ra_rad, dec_rad = _skycoord_radec_rad(coordinates)
+    ra_rad = numpy.ravel(ra_rad)[None, :]
+    dec_rad = numpy.ravel(dec_rad)[None, :]
+
+    ha_full, dec_full = _compute_ha_dec_rad_with_astrom(
+        _get_astroms(jds, lla, dut1)[:, None],
+        ra_rad, dec_rad
+    )
+    ha_refr, dec_refr = _compute_ha_dec_rad_with_astrom(
+        _get_astroms(jds, lla, dut1, refreshInterval_s=refreshInterval_s)[:, None],
+        ra_rad, dec_rad
+    )
+    ha_error = numpy.abs(numpy.angle(numpy.exp(1j*(ha_refr - ha_full))))
+    return ha_error.max(), numpy.abs(dec_refr - dec_full).max()
+
+def _compute_uvw_with_ha_dec(ha_rad, dec_rad, ant_coordinates, longitude):
+    """Computes UVW antenna coordinates for the given hour-angles and declinations
+
+    Args:
+        ha_rad: float or numpy.ndarray
+            Hour-angle(s) (radians) of shape S
+        dec_rad: float or numpy.ndarray
+            Declination(s) (radians) of shape S
+        ant_coordinates: numpy.ndarray
+            Antenna ECEF coordinates. This is indexed as (antenna_number, xyz)
+        longitude: float
+            Reference longitude (radians)
+
+    Returns:
+        The UVW coordinates in metres of each antenna. This
+        is indexed as (*S, antenna_number, uvw)
+    """
+    longitude_minus_hangle = longitude - numpy.asarray(ha_rad, dtype=numpy.float64)[..., None]
+    declination = numpy.asarray(dec_rad, dtype=numpy.float64)[..., None]
+    sin_long_minus_hangle = numpy.sin(longitude_minus_hangle)
+    cos_long_minus_hangle = numpy.cos(longitude_minus_hangle)
+    sin_declination = numpy.sin(declination)
+    cos_declination = numpy.cos(declination)
+
+    # RotZ(long-ha) anti-clockwise
+    x = cos_long_minus_hangle*ant_coordinates[:, 0] - (-sin_long_minus_hangle)*ant_coordinates[:, 1]
+    y = (-sin_long_minus_hangle)*ant_coordinates[:, 0] + cos_long_minus_hangle*ant_coordinates[:, 1]
+    z = numpy.broadcast_to(ant_coordinates[:, 2], x.shape)
+
+    # RotY(declination) clockwise
+    x_ = x
+    x = cos_declination*x_ + sin_declination*z
+    z = -sin_declination*x_ + cos_declination*z
+
+    # Permute (WUV) to (UVW)
+    return numpy.stack((y, z, x), axis=-1)
+
 def _compute_uvw(ts, source, ant_coordinates, lla, dut1=0.0):
     """Computes UVW antenna coordinates with respect to reference
 
@@ -65,39 +349,109 @@ def _compute_uvw(ts, source, ant_coordinates, lla, dut1=0.0):
         is indexed as (antenna_number, uvw)
     """
 
-    # get valid eraASTROM instance
-    astrom, eo = erfa.apco13(
-        ts.jd, 0,
+    ha_rad, dec_rad = compute_ha_dec(ts, source, lla, dut1=dut1)
+    return _compute_uvw_with_ha_dec(ha_rad, dec_rad, ant_coordinates, lla[0])
+
+# bytes held per (T, Boresight+Beam, A) element while computing the geometry:
+# the rotation terms, the rotated coordinates and the stacked UVWs
+_GEOMETRY_BYTES_PER_ELEMENT = 8*16
+
+def _compute_delays_ns(
+    times,
+    antennaPositions,
+    source_ra_rad,
+    source_dec_rad,
+    lla,
+    referenceAntennaIndex=0,
+    dut1=0.0,
+    astrometryRefreshInterval_s=None,
+):
+    """Computes the geometric delays of the beams relative to the boresight
+
+    Args:
+        times: numpy.ndarray [unix]
+        antennaPositions: numpy.ndarray [Antenna, XYZ]
+        source_ra_rad, source_dec_rad: numpy.ndarray [Boresight+Beam]
+            The first source is the boresight.
+        lla: tuple Longitude, Latitude, Altitude (radians)
+
+    Returns:
+        delays_ns (T, B, A)
+    """
+    # [Time]
+    astroms = _get_astroms(
+        Time(times, format='unix').jd,
+        lla,
         dut1,
-        *lla,
-        0, 0,
-        0, 0, 0, 0
+        refreshInterval_s=astrometryRefreshInterval_s
     )
-    ha_rad, dec_rad = _compute_ha_dec_with_astrom(astrom, source)
-    sin_long_minus_hangle = numpy.sin(lla[0]-ha_rad)
-    cos_long_minus_hangle = numpy.cos(lla[0]-ha_rad)
-    sin_declination = numpy.sin(dec_rad)
-    cos_declination = numpy.cos(dec_rad)
 
-    uvws = numpy.zeros(ant_coordinates.shape, dtype=numpy.float64)
-    
-    for ant in range(ant_coordinates.shape[0]):
-        # RotZ(long-ha) anti-clockwise
-        x = cos_long_minus_hangle*ant_coordinates[ant, 0] - (-sin_long_minus_hangle)*ant_coordinates[ant, 1]
-        y = (-sin_long_minus_hangle)*ant_coordinates[ant, 0] + cos_long_minus_hangle*ant_coordinates[ant, 1]
-        z = ant_coordinates[ant, 2]
-        
-        # RotY(declination) clockwise
-        x_ = x
-        x = cos_declination*x_ + sin_declination*z
-        z = -sin_declination*x_ + cos_declination*z
-        
-        # Permute (WUV) to (UVW)
-        uvws[ant, 0] = y
-        uvws[ant, 1] = z
-        uvws[ant, 2] = x
-        
-    return uvws
+    # [Time, Boresight+Beam]
+    ha_rad, dec_rad = _compute_ha_dec_rad_with_astrom(
+        astroms[:, None],
+        source_ra_rad[None, :],
+        source_dec_rad[None, :]
+    )
+    # [Time, Boresight+Beam, Antenna, UVW]
+    uvws = _compute_uvw_with_ha_dec(ha_rad, dec_rad, antennaPositions, lla[0])
+    # These UVWs are centred at the reference antenna,
+    # i.e. UVW_irefant = [0, 0, 0]
+    uvws -= uvws[:, :, referenceAntennaIndex:referenceAntennaIndex+1, :]
+
+    # [Time, Beam, Antenna]
+    return (uvws[:, 1:, :, 2] - uvws[:, 0:1, :, 2]) * (1e9 / const.c.value)
+
+def _compute_delays_ns_interpolated(times, maxError_ns, *args, **kwargs):
+    """Interpolates the geometric delays from exact delays at sparse knots
+
+    The exact delays (`_compute_delays_ns(times, *args, **kwargs)`) are
+    evaluated at Chebyshev knots spanning the times and each (beam, antenna)
+    delay is interpolated by a Chebyshev series. The interpolation is
+    checked against exact delays at the midpoints between knots, and the
+    knots are doubled until the check is within maxError_ns. Where that
+    would need about as many knots as there are times, the delays are
+    computed exactly at each time instead.
+
+    Returns:
+        delays_ns (T, B, A)
+    """
+    times = numpy.asarray(times, dtype=numpy.float64)
+    time_start, time_stop = times.min(), times.max()
+    to_time = lambda x: time_start + (x + 1)*(time_stop - time_start)/2
+
+    nKnots = 4
+    # only while the knots and checks are well short of the times
+    while 2*(2*nKnots - 1) <= times.shape[0] and time_stop > time_start:
+        # Chebyshev points of the first kind, ascending in [-1, 1]
+        knots = -numpy.cos(numpy.pi*(numpy.arange(nKnots) + 0.5)/nKnots)
+        checks = (knots[1:] + knots[:-1])/2
+
+        exact_delays_ns = _compute_delays_ns(
+            to_time(numpy.concatenate((knots, checks))),
+            *args,
+            **kwargs
+        )
+        delayShape = exact_delays_ns.shape[1:]
+        exact_delays_ns = exact_delays_ns.reshape(exact_delays_ns.shape[0], -1)
+
+        coefficients = numpy.polynomial.chebyshev.chebfit(
+            knots,
+            exact_delays_ns[:nKnots],
+            nKnots - 1
+        )
+        error_ns = numpy.abs(
+            numpy.polynomial.chebyshev.chebval(checks, coefficients).T
+            - exact_delays_ns[nKnots:]
+        ).max()
+        if error_ns <= maxError_ns:
+            x = 2*(times - time_start)/(time_stop - time_start) - 1
+            return numpy.polynomial.chebyshev.chebval(x, coefficients).T.reshape(
+                times.shape[0],
+                *delayShape
+            )
+        nKnots *= 2
+
+    return _compute_delays_ns(times, *args, **kwargs)
 
 def _create_delay_phasors(delay, frequencies):
     return -1.0j*2.0*numpy.pi*delay*frequencies
@@ -107,6 +461,662 @@ def _get_fringe_rate(delay, fringeFrequency):
     return -1.0j*2.0*numpy.pi*delay*fringeFrequency
 
 
+def _create_delay_phasors_blocked(delays, frequencies, referenceFrequency, blockLength=None, phasorDtype=numpy.complex128):
+    """Synthesizes the uncalibrated phasors of uniformly spaced frequencies
+
+    The phase is linear in frequency, so the channels of a block of
+    blockLength (sqrt(F) by default) are the block's first channel rotated
+    by the exponents of the channel offsets. Only the first channel of
+    each block and the offsets within a block are exponentiated, the rest
+    are complex multiplications. Every block is anchored by an exact
+    exponent, so rounding does not accumulate across the band. The
+    exponents are evaluated in double precision, the multiplications in
+    phasorDtype.
+
+    Args:
+        delays: numpy.ndarray (B, A, 1, T)
+        frequencies: numpy.ndarray (F) uniformly spaced
+
+    Returns:
+        phasors (B, A, F, T)
+    """
+    nChan = frequencies.shape[0]
+    if blockLength is None:
+        blockLength = int(numpy.ceil(numpy.sqrt(nChan)))
+    channelWidth = (frequencies[-1] - frequencies[0])/(nChan - 1) if nChan > 1 else 0.0
+    if not numpy.allclose(numpy.diff(frequencies), channelWidth, rtol=1e-9, atol=0):
+        raise ValueError("Recurrence phasor synthesis requires uniformly spaced frequencies.")
+
+    # (B, A, blocks, 1, T)
+    anchors = numpy.exp(
+        _create_delay_phasors(delays, (frequencies[::blockLength] - referenceFrequency)[:, None])
+        + _get_fringe_rate(delays, referenceFrequency)
+    ).astype(phasorDtype)[:, :, :, None, :]
+    # (B, A, 1, blockLength, T)
+    rotations = numpy.exp(
+        _create_delay_phasors(delays, (numpy.arange(blockLength)*channelWidth)[:, None])
+    ).astype(phasorDtype)[:, :, None, :, :]
+
+    phasors = anchors * rotations
+    return phasors.reshape(
+        phasors.shape[0],
+        phasors.shape[1],
+        -1,
+        phasors.shape[-1]
+    )[:, :, :nChan, :]
+
+
+def _synthesize_uncalibrated_phasors(
+    delays_ns,
+    frequencies,
+    referenceFrequency=None,
+    phasorSynthesis="exp",
+    phasorDtype=numpy.complex128,
+    antennaMask=None,
+):
+    """Synthesizes uncalibrated phasors from delays
+
+    Args:
+        delays_ns: numpy.ndarray
+            Delays indexed as (time, beam, antenna)
+        frequencies: numpy.ndarray
+            Channel frequencies
+        referenceFrequency: float
+            The frequency of the fringe-rate term, frequencies[0] by default.
+            Subbands of a band must share the band's referenceFrequency to
+            produce identical phasors.
+        phasorSynthesis: str
+            "exp" evaluates the exponent of every channel, "recurrence"
+            rotates blocks of channels (`_create_delay_phasors_blocked`).
+        phasorDtype: numpy.complex128 or numpy.complex64
+            The precision of the synthesis and the phasors. The delays and
+            phase arguments are always double precision.
+        antennaMask: numpy.ndarray [Antenna]
+            True for the antennas to synthesize, the others are zero-filled.
+
+    Returns:
+        phasors (B, A, F, T)
+    """
+    if referenceFrequency is None:
+        referenceFrequency = frequencies[0]
+    if antennaMask is not None and not numpy.all(antennaMask):
+        antennaMask = numpy.asarray(antennaMask, dtype=bool)
+        nTime, nBeam, nAnt = delays_ns.shape
+        phasors = numpy.zeros((nBeam, nAnt, frequencies.shape[0], nTime), dtype=phasorDtype)
+        phasors[:, antennaMask] = _synthesize_uncalibrated_phasors(
+            delays_ns[:, :, antennaMask],
+            frequencies,
+            referenceFrequency=referenceFrequency,
+            phasorSynthesis=phasorSynthesis,
+            phasorDtype=phasorDtype
+        )
+        return phasors
+
+    # (T, B, A) -> (B, A, 1, T)
+    delays = numpy.transpose(delays_ns, (1, 2, 0))[:, :, None, :]
+    if phasorSynthesis == "recurrence":
+        return _create_delay_phasors_blocked(
+            delays,
+            frequencies,
+            referenceFrequency,
+            phasorDtype=phasorDtype
+        )
+    elif phasorSynthesis == "exp":
+        return numpy.exp(
+            _create_delay_phasors(delays, (frequencies - referenceFrequency)[:, None])
+            + _get_fringe_rate(delays, referenceFrequency)
+        ).astype(phasorDtype, copy=False)
+    raise ValueError(f"Unrecognised phasorSynthesis, expected 'exp' or 'recurrence': '{phasorSynthesis}'.")
+
+
+def apply_calibration(uncalibratedPhasors, calibrationCoefficients, out=None):
+    """Applies calibration coefficients to uncalibrated phasors
+
+    The fine channels are reshaped to (coarse, ratio) so that fine channel
+    f is multiplied by coarse channel f // ratio's coefficients, in a
+    single broadcast multiplication. Previously synthesized uncalibrated
+    phasors can so be recalibrated without recomputing the geometry.
+
+    Args:
+        uncalibratedPhasors: numpy.ndarray (B, A, F, T)
+        calibrationCoefficients: numpy.ndarray (C, P, A)
+            F must be a multiple of C.
+        out: numpy.ndarray (B, A, F, T, P), optional
+            The array to write the phasors to, of the phasors' dtype.
+
+    Returns:
+        phasors (B, A, F, T, P)
+    """
+    nBeam, nAnt, nChan, nTime = uncalibratedPhasors.shape
+    nCoarse, nPol, _ = calibrationCoefficients.shape
+    assert nChan % nCoarse == 0, f"Calibration Coefficients' Frequency axis is not a factor of frequencies: {nCoarse} vs {nChan}."
+    calibrationCoeffFreqRatio = nChan // nCoarse
+
+    # (C, P, A) -> (A, C, 1, 1, P) broadcast against (B, A, C, ratio, T, 1)
+    calibration = numpy.transpose(calibrationCoefficients, (2, 0, 1)).astype(
+        uncalibratedPhasors.dtype
+    )[:, :, None, None, :]
+    phasorShape = (nBeam, nAnt, nChan, nTime, nPol)
+    if out is None:
+        out = numpy.empty(phasorShape, dtype=uncalibratedPhasors.dtype)
+    assert out.shape == phasorShape, f"Expected out of shape {phasorShape}, got {out.shape}."
+
+    numpy.multiply(
+        uncalibratedPhasors.reshape(
+            nBeam,
+            nAnt,
+            nCoarse,
+            calibrationCoeffFreqRatio,
+            nTime,
+            1
+        ),
+        calibration,
+        out=out.reshape(nBeam, nAnt, nCoarse, calibrationCoeffFreqRatio, nTime, nPol)
+    )
+    return out
+
+
+def _synthesize_phasors(
+    delays_ns,
+    frequencies,
+    calibrationCoefficients,
+    referenceFrequency=None,
+    phasorSynthesis="exp",
+    phasorDtype=numpy.complex128,
+    antennaMask=None,
+):
+    """Synthesizes calibrated phasors from delays, see
+    `_synthesize_uncalibrated_phasors` and `apply_calibration`. Antennas
+    excluded by antennaMask are zero-filled, without being synthesized
+    (their zero uncalibrated phasors calibrate to zero).
+
+    Returns:
+        phasors (B, A, F, T, P)
+    """
+    return apply_calibration(
+        _synthesize_uncalibrated_phasors(
+            delays_ns,
+            frequencies,
+            referenceFrequency=referenceFrequency,
+            phasorSynthesis=phasorSynthesis,
+            phasorDtype=phasorDtype,
+            antennaMask=antennaMask,
+        ),
+        calibrationCoefficients
+    )
+
+
+# outputs smaller than this are synthesized serially, regardless of workers
+PARALLEL_SYNTHESIS_MINIMUM_BYTES = 64*1024*1024
+
+def _synthesize_phasors_into_shared_memory(
+    sharedMemoryName,
+    phasorShape,
+    index,
+    delays_ns,
+    frequencies,
+    calibrationCoefficients,
+    referenceFrequency,
+    phasorSynthesis,
+    phasorDtype,
+    antennaMask,
+):
+    """Synthesizes the phasors of the delays into index of the shared phasors."""
+    sharedMemory = shared_memory.SharedMemory(name=sharedMemoryName)
+    try:
+        sharedPhasors = numpy.ndarray(phasorShape, dtype=phasorDtype, buffer=sharedMemory.buf)
+        sharedPhasors[index] = _synthesize_phasors(
+            delays_ns,
+            frequencies,
+            calibrationCoefficients,
+            referenceFrequency=referenceFrequency,
+            phasorSynthesis=phasorSynthesis,
+            phasorDtype=phasorDtype,
+            antennaMask=antennaMask,
+        )
+        del sharedPhasors
+    finally:
+        sharedMemory.close()
+
+def _close_shared_memory(sharedMemory):
+    try:
+        sharedMemory.close()
+    except BufferError:
+        # still exported, the mapping is released when collected
+        pass
+
+def _synthesize_phasors_parallel(
+    delays_ns,
+    frequencies,
+    calibrationCoefficients,
+    referenceFrequency=None,
+    phasorSynthesis="exp",
+    phasorDtype=numpy.complex128,
+    workers=1,
+    maxChunkBytes=256*1024*1024,
+    antennaMask=None,
+):
+    """Synthesizes calibrated phasors from delays across a process pool
+
+    The time axis, or the beam axis if there are fewer times than workers,
+    is split into chunks of at most about maxChunkBytes of working memory
+    each, which the workers synthesize straight into a shared memory
+    output. The phasors are returned in that shared memory rather than
+    copied out of it, so the peak memory is that of the phasors alone.
+    Outputs under PARALLEL_SYNTHESIS_MINIMUM_BYTES, or a single worker,
+    are synthesized serially.
+
+    Returns:
+        phasors (B, A, F, T, P)
+    """
+    nTime, nBeam, nAnt = delays_ns.shape
+    nPol = calibrationCoefficients.shape[1]
+    phasorShape = (nBeam, nAnt, frequencies.shape[0], nTime, nPol)
+    if referenceFrequency is None:
+        referenceFrequency = frequencies[0]
+    phasorBytes = numpy.prod(phasorShape)*numpy.dtype(phasorDtype).itemsize
+    if workers <= 1 or phasorBytes < PARALLEL_SYNTHESIS_MINIMUM_BYTES:
+        return _synthesize_phasors(
+            delays_ns,
+            frequencies,
+            calibrationCoefficients,
+            referenceFrequency=referenceFrequency,
+            phasorSynthesis=phasorSynthesis,
+            phasorDtype=phasorDtype,
+            antennaMask=antennaMask,
+        )
+
+    axisLength, axis = (nTime, 3) if nTime >= workers else (nBeam, 0)
+    workingBytes = numpy.prod(phasorShape[:-1])*_synthesis_bytes_per_element(nPol, phasorDtype)
+    chunkLength = max(1, min(
+        int(numpy.ceil(axisLength/workers)),
+        int(maxChunkBytes*axisLength // workingBytes),
+    ))
+
+    sharedMemory = shared_memory.SharedMemory(create=True, size=int(phasorBytes))
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for start in range(0, axisLength, chunkLength):
+                chunk_slice = slice(start, min(start+chunkLength, axisLength))
+                index = [slice(None)]*5
+                index[axis] = chunk_slice
+                futures.append(pool.submit(
+                    _synthesize_phasors_into_shared_memory,
+                    sharedMemory.name,
+                    phasorShape,
+                    tuple(index),
+                    delays_ns[chunk_slice] if axis == 3 else delays_ns[:, chunk_slice],
+                    frequencies,
+                    calibrationCoefficients,
+                    referenceFrequency,
+                    phasorSynthesis,
+                    phasorDtype,
+                    antennaMask,
+                ))
+            for future in futures:
+                future.result()
+    except BaseException:
+        sharedMemory.close()
+        raise
+    finally:
+        # the workers are done with the name, the mapping remains until closed
+        sharedMemory.unlink()
+
+    # the phasors are returned in place, the shared memory being closed
+    # once they (and any views of them) are collected
+    phasors = numpy.ndarray(phasorShape, dtype=phasorDtype, buffer=sharedMemory.buf)
+    weakref.finalize(phasors, _close_shared_memory, sharedMemory)
+    return phasors
+
+
+def phasor_synthesis_error(delays_ns, frequencies, phasorSynthesis="recurrence", phasorDtype=numpy.complex128):
+    """Measures the deviation of a phasor synthesis from the double precision
+    exp synthesis
+
+    Args:
+        delays_ns: numpy.ndarray (T, B, A)
+        frequencies: numpy.ndarray (F)
+        phasorSynthesis: str, as for `_synthesize_uncalibrated_phasors`
+        phasorDtype: numpy.complex128 or numpy.complex64
+
+    Returns:
+        (maximum absolute error, maximum phase error in radians) of the
+        uncalibrated phasors
+    """
+    reference = _synthesize_uncalibrated_phasors(delays_ns, frequencies)
+    synthesis = _synthesize_uncalibrated_phasors(
+        delays_ns,
+        frequencies,
+        phasorSynthesis=phasorSynthesis,
+        phasorDtype=phasorDtype
+    ).astype(numpy.complex128)
+    return (
+        numpy.abs(synthesis - reference).max(),
+        numpy.abs(numpy.angle(synthesis*reference.conj())).max(),
+    )
+
+
+class PhasorCache:
+    """A content-addressed, size-bounded on-disk cache of delays and phasors
+
+    Entries are `.npz` files in the directory, named by the SHA-256 of
+    their inputs (see `PhasorCache.key`). Loading an entry refreshes its
+    modification time, and storing an entry evicts the least recently
+    used entries beyond maxBytes. The directory may be shared by
+    concurrent processes: entries are written atomically and eviction
+    tolerates entries removed by others. Hits and misses are counted
+    per instance.
+    """
+
+    def __init__(self, directory, maxBytes=8*1024*1024*1024, logger=None):
+        self.directory = directory
+        self.maxBytes = maxBytes
+        self.logger = logger if logger is not None else logging.getLogger(__name__)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(*values):
+        """Returns the hexadecimal SHA-256 of the values (arrays or reprs)."""
+        digest = hashlib.sha256()
+        for value in values:
+            if isinstance(value, numpy.ndarray) and value.dtype != object:
+                digest.update(f"{value.dtype}{value.shape}".encode())
+                digest.update(numpy.ascontiguousarray(value).tobytes())
+            else:
+                digest.update(repr(value).encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _entry_filepath(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def load(self, key):
+        """Returns a dict of the arrays stored under key, or None."""
+        filepath = self._entry_filepath(key)
+        try:
+            with numpy.load(filepath) as entry:
+                arrays = {name: entry[name] for name in entry.files}
+            os.utime(filepath)
+        except (FileNotFoundError, OSError, ValueError):
+            self.misses += 1
+            self.logger.debug(f"Phasor cache miss: {key}")
+            return None
+        self.hits += 1
+        self.logger.debug(f"Phasor cache hit: {key}")
+        return arrays
+
+    def store(self, key, evict=True, **arrays):
+        """Stores the arrays under key, then evicts beyond maxBytes (unless
+        evict is False, when storing many entries at once).
+        Entries larger than maxBytes are not stored."""
+        if sum(array.nbytes for array in arrays.values()) > self.maxBytes:
+            self.logger.debug(f"Phasor cache entry exceeds {self.maxBytes} bytes: {key}")
+            return
+        filepath = self._entry_filepath(key)
+        tmp_filepath = f"{filepath}.{os.getpid()}.tmp"
+        with open(tmp_filepath, "wb") as fio:
+            numpy.savez(fio, **arrays)
+        os.replace(tmp_filepath, filepath)
+        if evict:
+            self.evict()
+
+    def _entries(self):
+        entries = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".npz"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, filename))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, filename))
+        return entries
+
+    def evict(self):
+        """Removes the least recently used entries beyond maxBytes."""
+        entries = sorted(self._entries())
+        total_bytes = sum(entry[1] for entry in entries)
+        for mtime, size, filename in entries:
+            if total_bytes <= self.maxBytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, filename))
+                self.logger.debug(f"Phasor cache evicted: {filename}")
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+
+    def statistics(self):
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(entries),
+            "bytes": sum(entry[1] for entry in entries),
+        }
+
+
+def _phasor_delays_ns(
+    antennaPositions,
+    boresightCoordinate,
+    beamCoordinates,
+    times,
+    lla,
+    referenceAntennaIndex=0,
+    dut1=0.0,
+    astrometryRefreshInterval_s=None,
+    delayInterpolationMaxError_ns=None,
+    maxChunkBytes=256*1024*1024,
+):
+    """Computes the delays_ns (T, B, A) for `phasors`
+
+    The beams are processed in batches (each with the boresight) that keep
+    the geometry's working memory under about maxChunkBytes.
+    """
+    beam_ra_rad, beam_dec_rad = _skycoord_radec_rad(beamCoordinates)
+    beam_ra_rad = numpy.ravel(beam_ra_rad)
+    beam_dec_rad = numpy.ravel(beam_dec_rad)
+    nTime = numpy.shape(times)[0]
+    nBeam = beam_ra_rad.shape[0]
+    nAnt = antennaPositions.shape[0]
+
+    beamChunkLength = max(1, maxChunkBytes // (nTime*nAnt*_GEOMETRY_BYTES_PER_ELEMENT))
+    delays_ns = numpy.empty((nTime, nBeam, nAnt), dtype=numpy.float64)
+    for b in range(0, nBeam, beamChunkLength):
+        beam_slice = slice(b, min(b+beamChunkLength, nBeam))
+        # [Boresight+Beam]
+        geometry = (
+            antennaPositions,
+            numpy.concatenate(([boresightCoordinate.ra.rad], beam_ra_rad[beam_slice])),
+            numpy.concatenate(([boresightCoordinate.dec.rad], beam_dec_rad[beam_slice])),
+            lla,
+            referenceAntennaIndex,
+            dut1,
+            astrometryRefreshInterval_s,
+        )
+        if delayInterpolationMaxError_ns is None:
+            delays_ns[:, beam_slice] = _compute_delays_ns(times, *geometry)
+        else:
+            delays_ns[:, beam_slice] = _compute_delays_ns_interpolated(
+                times,
+                delayInterpolationMaxError_ns,
+                *geometry
+            )
+    return delays_ns
+
+
+def active_antenna_mask(calibrationCoefficients, antennaMask=None):
+    """Returns the antennas (True) that are neither masked nor have
+    all-zero calibration coefficients.
+
+    Args:
+        calibrationCoefficients: numpy.ndarray [Frequency-channel, Polarization, Antenna]
+        antennaMask: numpy.ndarray [Antenna] True for active antennas, optional
+    """
+    activeAntennas = numpy.any(calibrationCoefficients != 0, axis=(0, 1))
+    if antennaMask is not None:
+        activeAntennas &= numpy.asarray(antennaMask, dtype=bool)
+    return activeAntennas
+
+
+def _delays_cache_key(
+    antennaPositions,
+    boresightCoordinate,
+    beamCoordinates,
+    lla,
+    referenceAntennaIndex,
+    dut1,
+    astrometryRefreshInterval_s,
+    delayInterpolationMaxError_ns,
+):
+    # the geometry, without the time grid: `delays` caches each time sample
+    return PhasorCache.key(
+        antennaPositions,
+        *_skycoord_radec_rad(boresightCoordinate),
+        *_skycoord_radec_rad(beamCoordinates),
+        tuple(lla),
+        referenceAntennaIndex,
+        dut1,
+        astrometryRefreshInterval_s,
+        delayInterpolationMaxError_ns,
+    )
+
+
+def delays(
+    antennaPositions: numpy.ndarray, # [Antenna, XYZ]
+    boresightCoordinate: SkyCoord, # ra-dec
+    beamCoordinates: 'list[SkyCoord]', #  ra-dec
+    times: numpy.ndarray, # [unix]
+    lla: tuple, # Longitude, Latitude, Altitude (radians)
+    referenceAntennaIndex: int = 0,
+    dut1: float = 0.0, # UT1-UTC (seconds)
+    astrometryRefreshInterval_s: float = None,
+    delayInterpolationMaxError_ns: float = None,
+    cache: PhasorCache = None,
+    maxChunkBytes: int = 256*1024*1024,
+):
+    """
+    The geometric delays of the beams relative to the boresight, as used by
+    `phasors`. The beamCoordinates are best given as a SkyCoord array (see
+    `beam_grid` for rasters): all beams are then computed in one batched
+    pass, split into batches of beams only to keep the working memory
+    under about maxChunkBytes. They are independent of frequency, so one delay set serves
+    every tuning (AC/BD) and subband of a pointing through
+    `phasors_from_delays`.
+
+    With a cache (which separate processes may share), the delays are
+    stored per time sample of a pointing and beam set, so time grids that
+    overlap (consecutive or repeated batches of a recording) reuse the
+    samples already computed and only the missing ones are computed, as
+    one grid. With astrometryRefreshInterval_s or
+    delayInterpolationMaxError_ns, a sample computed on another grid is
+    within the same error bound, but not necessarily identical.
+
+    Return
+    ------
+        delays_ns (T, B, A)
+
+    """
+    if cache is None:
+        return _phasor_delays_ns(
+            antennaPositions,
+            boresightCoordinate,
+            beamCoordinates,
+            times,
+            lla,
+            referenceAntennaIndex=referenceAntennaIndex,
+            dut1=dut1,
+            astrometryRefreshInterval_s=astrometryRefreshInterval_s,
+            delayInterpolationMaxError_ns=delayInterpolationMaxError_ns,
+            maxChunkBytes=maxChunkBytes,
+        )
+
+    delaysKey = _delays_cache_key(
+        antennaPositions,
+        boresightCoordinate,
+        beamCoordinates,
+        lla,
+        referenceAntennaIndex,
+        dut1,
+        astrometryRefreshInterval_s,
+        delayInterpolationMaxError_ns,
+    )
+    times = numpy.asarray(times, dtype=numpy.float64)
+    sampleKeys = [cache.key(delaysKey, float(t)) for t in times]
+    delays_ns = None
+    missing = []
+    for t, sampleKey in enumerate(sampleKeys):
+        entry = cache.load(sampleKey)
+        if entry is None:
+            missing.append(t)
+            continue
+        if delays_ns is None:
+            delays_ns = numpy.empty((times.shape[0], *entry["delays_ns"].shape), dtype=numpy.float64)
+        delays_ns[t] = entry["delays_ns"]
+    if len(missing) == 0:
+        return delays_ns
+
+    missingDelays_ns = _phasor_delays_ns(
+        antennaPositions,
+        boresightCoordinate,
+        beamCoordinates,
+        times[missing],
+        lla,
+        referenceAntennaIndex=referenceAntennaIndex,
+        dut1=dut1,
+        astrometryRefreshInterval_s=astrometryRefreshInterval_s,
+        delayInterpolationMaxError_ns=delayInterpolationMaxError_ns,
+        maxChunkBytes=maxChunkBytes,
+    )
+    if delays_ns is None:
+        delays_ns = missingDelays_ns
+    else:
+        delays_ns[missing] = missingDelays_ns
+    for t in missing:
+        cache.store(sampleKeys[t], evict=False, delays_ns=delays_ns[t])
+    cache.evict()
+    return delays_ns
+
+
+def phasors_from_delays(
+    delays_ns: numpy.ndarray, # [Time, Beam, Antenna]
+    frequencies: numpy.ndarray, # [channel-frequencies] Hz
+    calibrationCoefficients: numpy.ndarray, # [Frequency-channel, Polarization, Antenna]
+    referenceFrequency: float = None,
+    phasorSynthesis: str = "exp",
+    phasorDtype: type = numpy.complex128,
+    workers: int = 1,
+    antennaMask: numpy.ndarray = None, # [Antenna] True for active antennas
+):
+    """
+    Synthesizes the calibrated phasors of a tuning or subband's frequencies
+    from `delays`, with the options of `phasors`. A subband must be given
+    the first frequency of its whole band as referenceFrequency to
+    reproduce the band's phasors. Antennas flagged by antennaMask or their
+    calibration are zero-filled (see `active_antenna_mask`).
+
+    Return
+    ------
+        phasors (B, A, F, T, P)
+
+    """
+    assert frequencies.shape[0] % calibrationCoefficients.shape[0] == 0, f"Calibration Coefficients' Frequency axis is not a factor of frequencies: {calibrationCoefficients.shape[0]} vs {frequencies.shape[0]}."
+
+    return _synthesize_phasors_parallel(
+        delays_ns,
+        frequencies,
+        calibrationCoefficients,
+        referenceFrequency=referenceFrequency,
+        phasorSynthesis=phasorSynthesis,
+        phasorDtype=phasorDtype,
+        workers=workers,
+        antennaMask=active_antenna_mask(calibrationCoefficients, antennaMask),
+    )
+
+
 def phasors(
     antennaPositions: numpy.ndarray, # [Antenna, XYZ]
     boresightCoordinate: SkyCoord, # ra-dec
@@ -116,70 +1126,611 @@ def phasors(
     calibrationCoefficients: numpy.ndarray, # [Frequency-channel, Polarization, Antenna]
     lla: tuple, # Longitude, Latitude, Altitude (radians)
     referenceAntennaIndex: int = 0,
+    dut1: float = 0.0, # UT1-UTC (seconds)
+    astrometryRefreshInterval_s: float = None,
+    delayInterpolationMaxError_ns: float = None,
+    phasorSynthesis: str = "exp",
+    phasorDtype: type = numpy.complex128,
+    cache: PhasorCache = None,
+    workers: int = 1,
+    antennaMask: numpy.ndarray = None, # [Antenna] True for active antennas
 ):
     """
+    The geometry is computed for all times, the boresight and all beams at
+    once against (cached) eraASTROM contexts, the
+    phasors are synthesized for all (B, A, F, T, P) in broadcast operations.
+    Results match the element-wise loop formulation to within floating-point
+    rounding: delays to 1e-9 ns and phasors to 1e-9 absolute (the phase
+    arguments are identical, only the order of operations differs).
+
+    With astrometryRefreshInterval_s, the eraASTROM context is fully set up
+    only every so often and refreshed for the Earth rotation angle in
+    between (see `_get_astroms`). Over 10 minutes the hour-angle error is
+    ~5e-8 rad, but it is common to the boresight and beams so the delay
+    error stays ~1e-5 ns on 20 km baselines; `astrometry_refresh_error`
+    quantifies it for specific inputs.
+
+    With delayInterpolationMaxError_ns, the delays are computed exactly at
+    a few knot times only and interpolated to the others, within the given
+    error (see `_compute_delays_ns_interpolated`).
+
+    With phasorSynthesis="recurrence", the phasors of uniformly spaced
+    frequencies are synthesized by rotating blocks of channels instead of
+    exponentiating each channel (see `_create_delay_phasors_blocked`),
+    `phasor_synthesis_error` quantifies the difference.
+
+    With phasorDtype=numpy.complex64, the phasors are synthesized and
+    returned in single precision, halving their memory. The geometry,
+    delays and phase arguments remain double precision, so the phase
+    error is that of single precision rounding (~1e-7 rad), see
+    `phasor_synthesis_error`.
+
+    With workers > 1, the phasors of large problems are synthesized by a
+    pool of processes (see `_synthesize_phasors_parallel`).
+
+    With a cache, the delays are looked up by their geometry inputs (as
+    `delays`) and the phasors additionally by the frequencies, calibration
+    and synthesis options, computing and storing only what is missing.
+    `phasors` is `delays` followed by `phasors_from_delays`.
+
+    Antennas excluded by antennaMask, or whose calibration coefficients
+    are all zero, are flagged: their phasors are zero-filled without being
+    synthesized (see `active_antenna_mask`). Their delays are computed as
+    any other antenna's, the geometry being cheap next to the synthesis.
+    `uncalibrated_phasors`, `phasor_chunks` and `write_bfr5_phasors` flag
+    antennas alike.
+
     Return
     ------
-        phasors (B, A, F, T, P), delays_ns (T, A, B)
+        phasors (B, A, F, T, P), delays_ns (T, B, A)
 
     """
 
     assert frequencies.shape[0] % calibrationCoefficients.shape[0] == 0, f"Calibration Coefficients' Frequency axis is not a factor of frequencies: {calibrationCoefficients.shape[0]} vs {frequencies.shape[0]}."
 
-    phasorDims = (
-        beamCoordinates.shape[0],
-        antennaPositions.shape[0],
-        frequencies.shape[0],
-        times.shape[0],
-        calibrationCoefficients.shape[1]
+    if cache is not None:
+        phasorsKey = cache.key(
+            _delays_cache_key(
+                antennaPositions,
+                boresightCoordinate,
+                beamCoordinates,
+                lla,
+                referenceAntennaIndex,
+                dut1,
+                astrometryRefreshInterval_s,
+                delayInterpolationMaxError_ns,
+            ),
+            numpy.asarray(times, dtype=numpy.float64),
+            frequencies,
+            calibrationCoefficients,
+            phasorSynthesis,
+            numpy.dtype(phasorDtype).str,
+            antennaMask,
+        )
+        entry = cache.load(phasorsKey)
+        if entry is not None:
+            return entry["phasors"], entry["delays_ns"]
+
+    activeAntennas = active_antenna_mask(calibrationCoefficients, antennaMask)
+    delays_ns = delays(
+        antennaPositions,
+        boresightCoordinate,
+        beamCoordinates,
+        times,
+        lla,
+        referenceAntennaIndex=referenceAntennaIndex,
+        dut1=dut1,
+        astrometryRefreshInterval_s=astrometryRefreshInterval_s,
+        delayInterpolationMaxError_ns=delayInterpolationMaxError_ns,
+        cache=cache,
+    )
+    phasors = phasors_from_delays(
+        delays_ns,
+        frequencies,
+        calibrationCoefficients,
+        phasorSynthesis=phasorSynthesis,
+        phasorDtype=phasorDtype,
+        workers=workers,
+        antennaMask=activeAntennas,
     )
-    calibrationCoeffFreqRatio = frequencies.shape[0] // calibrationCoefficients.shape[0]
 
-    phasors = numpy.zeros(phasorDims, dtype=numpy.complex128)
-    
-    delays_ns = numpy.zeros(
-        (
-            times.shape[0],
-            beamCoordinates.shape[0],
-            antennaPositions.shape[0],
-        ),
-        dtype=numpy.float64
+    if cache is not None:
+        cache.store(phasorsKey, phasors=phasors, delays_ns=delays_ns)
+    return phasors, delays_ns
+
+
+def uncalibrated_phasors(
+    antennaPositions: numpy.ndarray, # [Antenna, XYZ]
+    boresightCoordinate: SkyCoord, # ra-dec
+    beamCoordinates: 'list[SkyCoord]', #  ra-dec
+    times: numpy.ndarray, # [unix]
+    frequencies: numpy.ndarray, # [channel-frequencies] Hz
+    lla: tuple, # Longitude, Latitude, Altitude (radians)
+    referenceAntennaIndex: int = 0,
+    dut1: float = 0.0, # UT1-UTC (seconds)
+    astrometryRefreshInterval_s: float = None,
+    delayInterpolationMaxError_ns: float = None,
+    phasorSynthesis: str = "exp",
+    phasorDtype: type = numpy.complex128,
+    antennaMask: numpy.ndarray = None, # [Antenna] True for active antennas
+):
+    """
+    The `phasors` without calibration, for `apply_calibration` to later
+    apply any calibration coefficients to. Only antennaMask flags antennas,
+    there being no calibration coefficients to flag them by.
+
+    Return
+    ------
+        phasors (B, A, F, T), delays_ns (T, B, A)
+
+    """
+    delays_ns = _phasor_delays_ns(
+        antennaPositions,
+        boresightCoordinate,
+        beamCoordinates,
+        times,
+        lla,
+        referenceAntennaIndex=referenceAntennaIndex,
+        dut1=dut1,
+        astrometryRefreshInterval_s=astrometryRefreshInterval_s,
+        delayInterpolationMaxError_ns=delayInterpolationMaxError_ns,
+    )
+    return _synthesize_uncalibrated_phasors(
+        delays_ns,
+        frequencies,
+        phasorSynthesis=phasorSynthesis,
+        phasorDtype=phasorDtype,
+        antennaMask=antennaMask,
+    ), delays_ns
+
+
+# bytes held per (B, A, F, T) element while synthesizing:
+# the complex128 phase argument and its exponent, its cast and the P outputs
+def _synthesis_bytes_per_element(nPol, phasorDtype=numpy.complex128):
+    return 16*2 + numpy.dtype(phasorDtype).itemsize*(1 + nPol)
+
+
+def phasor_chunks(
+    antennaPositions: numpy.ndarray, # [Antenna, XYZ]
+    boresightCoordinate: SkyCoord, # ra-dec
+    beamCoordinates: 'list[SkyCoord]', #  ra-dec
+    times: numpy.ndarray, # [unix]
+    frequencies: numpy.ndarray, # [channel-frequencies] Hz
+    calibrationCoefficients: numpy.ndarray, # [Frequency-channel, Polarization, Antenna]
+    lla: tuple, # Longitude, Latitude, Altitude (radians)
+    referenceAntennaIndex: int = 0,
+    dut1: float = 0.0, # UT1-UTC (seconds)
+    astrometryRefreshInterval_s: float = None,
+    delayInterpolationMaxError_ns: float = None,
+    phasorSynthesis: str = "exp",
+    phasorDtype: type = numpy.complex128,
+    chunkAxis: str = "time",
+    maxChunkBytes: int = 256*1024*1024,
+    cache: PhasorCache = None,
+    antennaMask: numpy.ndarray = None, # [Antenna] True for active antennas
+):
+    """
+    Generates the `phasors` in chunks along time or frequency, so that the
+    full (B, A, F, T, P) array is never held. The delays are computed once
+    up front (they are small) and each chunk is synthesized with at most
+    about maxChunkBytes of working memory. Frequency chunks span whole
+    calibration (coarse) channels. A single time step or coarse channel
+    is the smallest chunk, regardless of maxChunkBytes.
+
+    The concatenation of the chunks equals the output of `phasors` (to
+    rounding for frequency chunks with phasorSynthesis="recurrence", whose
+    blocks then start at each chunk).
+
+    With a cache, the delays are looked up and stored as by `delays`.
+    Antennas are flagged as by `phasors`.
+
+    Yield
+    -----
+        index (tuple of slices into (B, A, F, T, P)),
+        phasors chunk (B, A, F', T', P),
+        delays_ns chunk (T', B, A)
+
+    """
+
+    assert frequencies.shape[0] % calibrationCoefficients.shape[0] == 0, f"Calibration Coefficients' Frequency axis is not a factor of frequencies: {calibrationCoefficients.shape[0]} vs {frequencies.shape[0]}."
+    if chunkAxis not in ["time", "frequency"]:
+        raise ValueError(f"Unrecognised chunkAxis, expected 'time' or 'frequency': '{chunkAxis}'.")
+
+    activeAntennas = active_antenna_mask(calibrationCoefficients, antennaMask)
+    delays_ns = delays(
+        antennaPositions,
+        boresightCoordinate,
+        beamCoordinates,
+        times,
+        lla,
+        referenceAntennaIndex=referenceAntennaIndex,
+        dut1=dut1,
+        astrometryRefreshInterval_s=astrometryRefreshInterval_s,
+        delayInterpolationMaxError_ns=delayInterpolationMaxError_ns,
+        cache=cache,
     )
+    nTime, nBeam, nAnt = delays_ns.shape
+    nCoarse, nPol, _ = calibrationCoefficients.shape
+    calibrationCoeffFreqRatio = frequencies.shape[0] // nCoarse
+    bytesPerElement = _synthesis_bytes_per_element(nPol, phasorDtype)
+
+    if chunkAxis == "time":
+        bytesPerStep = nBeam*nAnt*frequencies.shape[0]*bytesPerElement
+        chunkLength = max(1, maxChunkBytes // bytesPerStep)
+        for t in range(0, nTime, chunkLength):
+            time_slice = slice(t, min(t+chunkLength, nTime))
+            yield (
+                (slice(None), slice(None), slice(None), time_slice, slice(None)),
+                _synthesize_phasors(
+                    delays_ns[time_slice],
+                    frequencies,
+                    calibrationCoefficients,
+                    phasorSynthesis=phasorSynthesis,
+                    phasorDtype=phasorDtype,
+                    antennaMask=activeAntennas,
+                ),
+                delays_ns[time_slice]
+            )
+    else:
+        bytesPerStep = nBeam*nAnt*calibrationCoeffFreqRatio*nTime*bytesPerElement
+        chunkLength = max(1, maxChunkBytes // bytesPerStep)
+        for c in range(0, nCoarse, chunkLength):
+            coarse_slice = slice(c, min(c+chunkLength, nCoarse))
+            fine_slice = slice(
+                coarse_slice.start*calibrationCoeffFreqRatio,
+                coarse_slice.stop*calibrationCoeffFreqRatio
+            )
+            yield (
+                (slice(None), slice(None), fine_slice, slice(None), slice(None)),
+                _synthesize_phasors(
+                    delays_ns,
+                    frequencies[fine_slice],
+                    calibrationCoefficients[coarse_slice],
+                    referenceFrequency=frequencies[0],
+                    phasorSynthesis=phasorSynthesis,
+                    phasorDtype=phasorDtype,
+                    antennaMask=activeAntennas,
+                ),
+                delays_ns
+            )
+
+
+def _hdf5_replace_dataset(group, name, **kwargs):
+    if name in group:
+        del group[name]
+    return group.create_dataset(name, **kwargs)
+
+
+def write_bfr5_phasors(
+    bfr5Filepath: str,
+    antennaPositions: numpy.ndarray, # [Antenna, XYZ]
+    boresightCoordinate: SkyCoord, # ra-dec
+    beamCoordinates: 'list[SkyCoord]', #  ra-dec
+    times: numpy.ndarray, # [unix]
+    frequencies: numpy.ndarray, # [channel-frequencies] Hz
+    calibrationCoefficients: numpy.ndarray, # [Frequency-channel, Polarization, Antenna]
+    lla: tuple, # Longitude, Latitude, Altitude (radians)
+    referenceAntennaIndex: int = 0,
+    dut1: float = 0.0, # UT1-UTC (seconds)
+    astrometryRefreshInterval_s: float = None,
+    delayInterpolationMaxError_ns: float = None,
+    phasorSynthesis: str = "exp",
+    storeComplex64: bool = False,
+    compression: str = None, # h5py compression filter, e.g. "gzip", "lzf"
+    compressionOpts = None,
+    maxChunkBytes: int = 256*1024*1024,
+    storageChunkBytes: int = 4*1024*1024,
+    cache: PhasorCache = None,
+    antennaMask: numpy.ndarray = None, # [Antenna] True for active antennas
+):
+    """
+    Streams the `phasors` and delays into a BFR5 file, creating or
+    replacing the datasets:
+        delayinfo/delays (T, B, A), delayinfo/time_array (T),
+        delayinfo/jds (T), delayinfo/dut1,
+        phasorinfo/phasors (B, A, F, T, P)
+    Other groups of an existing BFR5 file are left as they are.
+
+    The phasors are generated with `phasor_chunks` along time and written
+    chunk by chunk, so the full cube is never held in memory. The HDF5
+    storage is chunked per time step for all beams and antennas, matching
+    the beamformer's read pattern, with the frequency axis split to keep
+    each storage chunk near storageChunkBytes. With storeComplex64 the
+    phasors are synthesized and stored in single precision, as consumed
+    by blade-cli. With a cache, the delays are looked up and stored as by
+    `delays`, so consecutive batches of a recording reuse their overlap.
+    Antennas are flagged as by `phasors`.
+
+    Return
+    ------
+        bfr5Filepath
+
+    """
+    phasorDtype = numpy.complex64 if storeComplex64 else numpy.complex128
+    nBeam = len(beamCoordinates)
+    nAnt = antennaPositions.shape[0]
+    nChan = frequencies.shape[0]
+    nTime = times.shape[0]
+    nPol = calibrationCoefficients.shape[1]
+
+    storageChunkChannels = max(1, min(
+        nChan,
+        storageChunkBytes // (nBeam*nAnt*nPol*numpy.dtype(phasorDtype).itemsize)
+    ))
 
-    for t, tval in enumerate(times):
-        ts = Time(tval, format='unix')
-        boresightUvw = _compute_uvw(
-            ts,
-            boresightCoordinate, 
+    with h5py.File(bfr5Filepath, "a") as bfr5:
+        delayinfo = bfr5.require_group("delayinfo")
+        phasorinfo = bfr5.require_group("phasorinfo")
+
+        _hdf5_replace_dataset(delayinfo, "time_array", data=times)
+        _hdf5_replace_dataset(delayinfo, "jds", data=Time(times, format='unix').jd)
+        _hdf5_replace_dataset(delayinfo, "dut1", data=dut1)
+        delays_dataset = _hdf5_replace_dataset(
+            delayinfo, "delays",
+            shape=(nTime, nBeam, nAnt),
+            dtype=numpy.float64,
+            chunks=(1, nBeam, nAnt),
+            compression=compression,
+            compression_opts=compressionOpts,
+        )
+        phasors_dataset = _hdf5_replace_dataset(
+            phasorinfo, "phasors",
+            shape=(nBeam, nAnt, nChan, nTime, nPol),
+            dtype=phasorDtype,
+            chunks=(nBeam, nAnt, storageChunkChannels, 1, nPol),
+            compression=compression,
+            compression_opts=compressionOpts,
+        )
+        phasors_dataset.attrs["dimensions"] = "beam, antenna, frequency, time, polarization"
+
+        for index, phasorsChunk, delaysChunk in phasor_chunks(
             antennaPositions,
-            lla
+            boresightCoordinate,
+            beamCoordinates,
+            times,
+            frequencies,
+            calibrationCoefficients,
+            lla,
+            referenceAntennaIndex=referenceAntennaIndex,
+            dut1=dut1,
+            astrometryRefreshInterval_s=astrometryRefreshInterval_s,
+            delayInterpolationMaxError_ns=delayInterpolationMaxError_ns,
+            phasorSynthesis=phasorSynthesis,
+            phasorDtype=phasorDtype,
+            chunkAxis="time",
+            maxChunkBytes=maxChunkBytes,
+            cache=cache,
+            antennaMask=antennaMask,
+        ):
+            phasors_dataset[index] = phasorsChunk
+            delays_dataset[index[3]] = delaysChunk
+
+    return bfr5Filepath
+
+
+def delay_polynomials(
+    antennaPositions: numpy.ndarray, # [Antenna, XYZ]
+    boresightCoordinate: SkyCoord, # ra-dec
+    beamCoordinates: 'list[SkyCoord]', #  ra-dec
+    times: numpy.ndarray, # [unix]
+    lla: tuple, # Longitude, Latitude, Altitude (radians)
+    referenceAntennaIndex: int = 0,
+    dut1: float = 0.0, # UT1-UTC (seconds)
+    astrometryRefreshInterval_s: float = None,
+    referenceTime: float = None, # [unix]
+    order: int = 2,
+):
+    """
+    Fits the delays of each (beam, antenna) over the times with a Taylor
+    polynomial about referenceTime (the middle of the times by default):
+        delay(t) = delay + rate*(t-t0) + acceleration*(t-t0)**2/2 + ...
+    The order is reduced where there are too few times for it.
+
+    Return
+    ------
+        coefficients (order+1, B, A) in ns/s**k, referenceTime,
+        maximum absolute fit residual (ns) at the times
+
+    """
+    times = numpy.asarray(times, dtype=numpy.float64)
+    if referenceTime is None:
+        referenceTime = (times.min() + times.max())/2
+    order = min(order, times.shape[0]-1)
+
+    delays_ns = _phasor_delays_ns(
+        antennaPositions,
+        boresightCoordinate,
+        beamCoordinates,
+        times,
+        lla,
+        referenceAntennaIndex=referenceAntennaIndex,
+        dut1=dut1,
+        astrometryRefreshInterval_s=astrometryRefreshInterval_s,
+    )
+    nTime, nBeam, nAnt = delays_ns.shape
+
+    polynomial = numpy.polynomial.polynomial.polyfit(
+        times - referenceTime,
+        delays_ns.reshape(nTime, -1),
+        order
+    )
+    residual_ns = numpy.abs(
+        numpy.polynomial.polynomial.polyval(times - referenceTime, polynomial).T
+        - delays_ns.reshape(nTime, -1)
+    ).max()
+
+    # polynomial to Taylor coefficients: c_k = d^k(delay)/dt^k / k!
+    factorials = numpy.cumprod(numpy.concatenate(([1], numpy.arange(1, order+1))))
+    coefficients = (polynomial*factorials[:, None]).reshape(order+1, nBeam, nAnt)
+    return coefficients, referenceTime, residual_ns
+
+
+def evaluate_delay_polynomials(coefficients, referenceTime, times):
+    """Evaluates `delay_polynomials` coefficients at the times [unix]
+
+    Returns:
+        delays_ns (T, B, A)
+    """
+    order = coefficients.shape[0] - 1
+    factorials = numpy.cumprod(numpy.concatenate(([1], numpy.arange(1, order+1))))
+    polynomial = coefficients.reshape(order+1, -1)/factorials[:, None]
+    dt = numpy.asarray(times, dtype=numpy.float64) - referenceTime
+    return numpy.polynomial.polynomial.polyval(dt, polynomial).T.reshape(
+        dt.shape[0],
+        *coefficients.shape[1:]
+    )
+
+
+def phasors_from_delay_polynomials(
+    coefficients: numpy.ndarray, # [Order, Beam, Antenna]
+    referenceTime: float, # [unix]
+    times: numpy.ndarray, # [unix]
+    frequencies: numpy.ndarray, # [channel-frequencies] Hz
+    calibrationCoefficients: numpy.ndarray, # [Frequency-channel, Polarization, Antenna]
+    referenceFrequency: float = None,
+    phasorSynthesis: str = "exp",
+    phasorDtype: type = numpy.complex128,
+):
+    """
+    Evaluates the phasors of `delay_polynomials` coefficients on demand, for
+    any times and slice of frequencies (with the corresponding slice of
+    the calibration coefficients). A frequency slice must be given the
+    first frequency of the whole band as referenceFrequency to reproduce
+    the band's phasors.
+
+    Return
+    ------
+        phasors (B, A, F, T, P), delays_ns (T, B, A)
+
+    """
+    assert frequencies.shape[0] % calibrationCoefficients.shape[0] == 0, f"Calibration Coefficients' Frequency axis is not a factor of frequencies: {calibrationCoefficients.shape[0]} vs {frequencies.shape[0]}."
+
+    delays_ns = evaluate_delay_polynomials(coefficients, referenceTime, times)
+    return _synthesize_phasors(
+        delays_ns,
+        frequencies,
+        calibrationCoefficients,
+        referenceFrequency=referenceFrequency,
+        phasorSynthesis=phasorSynthesis,
+        phasorDtype=phasorDtype
+    ), delays_ns
+
+
+def write_bfr5_delay_polynomials(bfr5Filepath, coefficients, referenceTime):
+    """
+    Stores `delay_polynomials` coefficients in a BFR5 file, as
+    delayinfo/delay_polynomials (order+1, B, A) with the referenceTime
+    [unix] in its "reference_time" attribute.
+    """
+    with h5py.File(bfr5Filepath, "a") as bfr5:
+        dataset = _hdf5_replace_dataset(
+            bfr5.require_group("delayinfo"),
+            "delay_polynomials",
+            data=coefficients
         )
-        boresightUvw -= boresightUvw[referenceAntennaIndex:referenceAntennaIndex+1, :]
-        for b in range(phasorDims[0]):
-            # These UVWs are centred at the reference antenna, 
-            # i.e. UVW_irefant = [0, 0, 0]
-            beamUvw = _compute_uvw( # [Antenna, UVW]
-                ts,
-                beamCoordinates[b], 
-                antennaPositions,
-                lla
-            )
-            beamUvw -= beamUvw[referenceAntennaIndex:referenceAntennaIndex+1, :]
-
-            delays_ns[t, b, :] = (beamUvw[:,2] - boresightUvw[:,2]) * (1e9 / const.c.value)
-            for a, delay in enumerate(delays_ns[t, b, :]):
-                delay_factors = _create_delay_phasors(
-                    delay,
-                    frequencies - frequencies[0]
-                )
-                fringe_factor = _get_fringe_rate(
-                    delay,
-                    frequencies[0]
-                )
-
-                phasor = numpy.exp(delay_factors+fringe_factor)
-                for p in range(phasorDims[-1]):
-                    for c in range(calibrationCoeffFreqRatio):
-                        fine_slice = range(c, frequencies.shape[0], calibrationCoeffFreqRatio)
-                        phasors[b, a, fine_slice, t, p] = phasor[fine_slice] * calibrationCoefficients[:, p, a]
-    return phasors, delays_ns
\ No newline at end of file
+        dataset.attrs["reference_time"] = referenceTime
+        dataset.attrs["dimensions"] = "taylor-order, beam, antenna"
+    return bfr5Filepath
+
+
+def read_bfr5_delay_polynomials(bfr5Filepath):
+    """
+    Return
+    ------
+        coefficients (order+1, B, A), referenceTime [unix]
+
+    """
+    with h5py.File(bfr5Filepath, "r") as bfr5:
+        dataset = bfr5["delayinfo"]["delay_polynomials"]
+        return dataset[:], float(dataset.attrs["reference_time"])
+
+
+def _hdf5_string(value):
+    return value.decode() if isinstance(value, bytes) else str(value)
+
+
+def read_bfr5_geometry(bfr5Filepath):
+    """
+    Reads the geometry a BFR5 file records (telinfo, obsinfo phase-center,
+    beaminfo and delayinfo/dut1) as the keyword arguments of `delays`:
+        antennaPositions, boresightCoordinate, beamCoordinates, lla, dut1
+    Absolute (ECEF/XYZ) antenna positions are made relative to the
+    telescope's reference point. ENU antenna positions are not supported.
+    """
+    with h5py.File(bfr5Filepath, "r") as bfr5:
+        telinfo = bfr5["telinfo"]
+        antennaPositions = telinfo["antenna_positions"][:].astype(numpy.float64)
+        frame = _hdf5_string(telinfo["antenna_position_frame"][()]).lower() if "antenna_position_frame" in telinfo else "ecef"
+        longitude = float(telinfo["longitude"][()])
+        latitude = float(telinfo["latitude"][()])
+        altitude = float(telinfo["altitude"][()])
+
+        boresightCoordinate = SkyCoord(
+            float(bfr5["obsinfo"]["phase_center_ra"][()])*units.rad,
+            float(bfr5["obsinfo"]["phase_center_dec"][()])*units.rad,
+        )
+        beamCoordinates = SkyCoord(
+            bfr5["beaminfo"]["ras"][:]*units.rad,
+            bfr5["beaminfo"]["decs"][:]*units.rad,
+        )
+        dut1 = float(bfr5["delayinfo"]["dut1"][()]) if "dut1" in bfr5.get("delayinfo", {}) else 0.0
+
+    if frame == "enu":
+        raise ValueError(f"ENU antenna positions are not supported: {bfr5Filepath}")
+    if numpy.linalg.norm(antennaPositions[0]) > 6e6:
+        transform_antenna_positions_xyz_to_ecef(longitude, latitude, altitude, antennaPositions)
+
+    return {
+        "antennaPositions": antennaPositions,
+        "boresightCoordinate": boresightCoordinate,
+        "beamCoordinates": beamCoordinates,
+        "lla": (numpy.radians(longitude), numpy.radians(latitude), altitude),
+        "dut1": dut1,
+    }
+
+
+def write_bfr5_delays(
+    bfr5Filepath: str,
+    antennaPositions: numpy.ndarray, # [Antenna, XYZ]
+    boresightCoordinate: SkyCoord, # ra-dec
+    beamCoordinates: 'list[SkyCoord]', #  ra-dec
+    times: numpy.ndarray, # [unix]
+    lla: tuple, # Longitude, Latitude, Altitude (radians)
+    referenceAntennaIndex: int = 0,
+    dut1: float = 0.0, # UT1-UTC (seconds)
+    astrometryRefreshInterval_s: float = None,
+    delayInterpolationMaxError_ns: float = None,
+):
+    """
+    Writes the (time-dependent) `delays` into a BFR5 file, creating or
+    replacing the datasets:
+        delayinfo/delays (T, B, A), delayinfo/time_array (T),
+        delayinfo/jds (T), delayinfo/dut1
+    Other groups of an existing BFR5 file are left as they are, so with
+    `read_bfr5_geometry` an existing file can be moved to another time
+    range of the same pointing.
+
+    Return
+    ------
+        bfr5Filepath
+
+    """
+    delays_ns = delays(
+        antennaPositions,
+        boresightCoordinate,
+        beamCoordinates,
+        times,
+        lla,
+        referenceAntennaIndex=referenceAntennaIndex,
+        dut1=dut1,
+        astrometryRefreshInterval_s=astrometryRefreshInterval_s,
+        delayInterpolationMaxError_ns=delayInterpolationMaxError_ns,
+    )
+    with h5py.File(bfr5Filepath, "a") as bfr5:
+        delayinfo = bfr5.require_group("delayinfo")
+        _hdf5_replace_dataset(delayinfo, "time_array", data=times)
+        _hdf5_replace_dataset(delayinfo, "jds", data=Time(times, format='unix').jd)
+        _hdf5_replace_dataset(delayinfo, "dut1", data=dut1)
+        _hdf5_replace_dataset(delayinfo, "delays", data=delays_ns)
+
+    return bfr5Filepath
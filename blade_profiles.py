@@ -0,0 +1,267 @@
+import csv
+import fcntl
+import random
+
+import numpy
+
+# the columns of the profiles written by tests/profile_beamformsearch.py
+PROFILE_HEADERS = ["chanrate", "bfrate", "elapsed_s", "number_of_beams", "gpu_memuse_MiB", "successful"]
+_PROFILE_TYPES = {
+    "chanrate": int,
+    "bfrate": int,
+    "elapsed_s": float,
+    "number_of_beams": int,
+    "gpu_memuse_MiB": int,
+    "successful": lambda value: value.strip().lower() == "true",
+    # recorded by the auto-tuner (see `record_profile`)
+    "coarse_channels": int,
+    "workers": int,
+    "input_bytes": int,
+    # the number of output products (.seticore.* and .fil files)
+    "outputs": int,
+}
+# the columns of the auto-tuner's results store
+TUNING_HEADERS = PROFILE_HEADERS + ["coarse_channels", "workers", "input_bytes", "outputs", "hostname"]
+
+
+def load_profiles(csv_filepath):
+    """
+    Loads the rows of a blade_profiles.csv (as written by
+    tests/profile_beamformsearch.py), typed. Further columns are kept as
+    they are, missing ones default to None.
+    """
+    profiles = []
+    with open(csv_filepath, "r", newline="") as fio:
+        for row in csv.DictReader(fio):
+            profile = dict(row)
+            for header, cast in _PROFILE_TYPES.items():
+                value = row.get(header, None)
+                profile[header] = cast(value) if value not in [None, ""] else None
+            profiles.append(profile)
+    return profiles
+
+
+def _memory_features(chanrate, bfrate, number_of_beams, coarse_channels=1, workers=1):
+    # a constant (context, beamformer state), the per-block buffers
+    # (upchannelized samples) and the beamformed buffers (per beam), the
+    # buffers being held by each worker
+    samples = numpy.asarray(chanrate, dtype=numpy.float64)*bfrate*coarse_channels*workers
+    return numpy.stack(
+        numpy.broadcast_arrays(numpy.ones_like(samples), samples, samples*number_of_beams),
+        axis=-1
+    )
+
+
+class BladeMemoryModel:
+    """
+    The GPU memory (MiB) of a blade-cli job, modelled as linear in
+        1, (N * C * c * T) and (N * C * c * T * beams)
+    for the number of workers N (-N), coarse-channel ingest rate C (-C),
+    channelization rate c (-c), beamform time T (-T) and the number of
+    beams, fitted (non-negatively) to successful profiles. Predictions are
+    padded by the larger of the largest under-prediction of the fit and a
+    fraction of the prediction. The profiles are taken at C=1 and N=1
+    (unless they record otherwise), the model assumes C scales the buffers
+    and each worker holds its own.
+    """
+    def __init__(self, coefficients, margin_MiB=0.0, margin_fraction=0.1):
+        self.coefficients = numpy.asarray(coefficients, dtype=numpy.float64)
+        self.margin_MiB = margin_MiB
+        self.margin_fraction = margin_fraction
+
+    @classmethod
+    def fit(cls, profiles, margin_fraction=0.1):
+        profiles = [
+            profile
+            for profile in profiles
+            if profile["successful"] and profile["gpu_memuse_MiB"] is not None and profile["gpu_memuse_MiB"] > 0
+        ]
+        if len(profiles) < 3:
+            raise ValueError(f"At least 3 successful profiles are needed to fit the memory model, got {len(profiles)}.")
+
+        features = _memory_features(
+            [profile["chanrate"] for profile in profiles],
+            numpy.array([profile["bfrate"] for profile in profiles]),
+            numpy.array([profile["number_of_beams"] for profile in profiles]),
+            numpy.array([profile.get("coarse_channels", None) or 1 for profile in profiles]),
+            numpy.array([profile.get("workers", None) or 1 for profile in profiles]),
+        )
+        memory = numpy.array([profile["gpu_memuse_MiB"] for profile in profiles], dtype=numpy.float64)
+
+        # least-squares over the features, dropping those fitted negative
+        active = numpy.ones(features.shape[1], dtype=bool)
+        while True:
+            coefficients = numpy.zeros(features.shape[1])
+            coefficients[active] = numpy.linalg.lstsq(features[:, active], memory, rcond=None)[0]
+            if (coefficients >= 0).all():
+                break
+            active &= coefficients > 0
+
+        margin_MiB = max(0.0, numpy.max(memory - features @ coefficients))
+        return cls(coefficients, margin_MiB=margin_MiB, margin_fraction=margin_fraction)
+
+    @classmethod
+    def from_csv(cls, csv_filepath, margin_fraction=0.1):
+        return cls.fit(load_profiles(csv_filepath), margin_fraction=margin_fraction)
+
+    def predict(self, chanrate, bfrate, number_of_beams, coarse_channels=1, workers=1):
+        """
+        Return
+        ------
+            int: the padded GPU memory (MiB) of the job
+        """
+        estimate = float(_memory_features(chanrate, bfrate, number_of_beams, coarse_channels, workers) @ self.coefficients)
+        return int(numpy.ceil(estimate + max(self.margin_MiB, self.margin_fraction*estimate)))
+
+    def largest_bfrate(self, chanrate, number_of_beams, memory_MiB, bfrate_maximum, coarse_channels=1, workers=1):
+        """
+        Returns the largest beamform time (-T), halving from bfrate_maximum,
+        whose job is predicted to fit memory_MiB, or None if none does.
+        """
+        bfrate = bfrate_maximum
+        while bfrate >= 1:
+            if self.predict(chanrate, bfrate, number_of_beams, coarse_channels, workers) <= memory_MiB:
+                return bfrate
+            bfrate //= 2
+        return None
+
+
+def record_profile(csv_filepath, profile):
+    """
+    Appends the profile (a dict over TUNING_HEADERS) to the results store,
+    writing the headers to a new store. A store of other columns (from an
+    earlier version) is first rewritten with TUNING_HEADERS, its rows
+    lacking the new columns. The store is locked while appending, so
+    concurrent instances can share it.
+    """
+    with open(csv_filepath, "a+", newline="") as fio:
+        fcntl.flock(fio, fcntl.LOCK_EX)
+        fio.seek(0)
+        reader = csv.DictReader(fio)
+        writer = csv.DictWriter(fio, fieldnames=TUNING_HEADERS, extrasaction="ignore")
+        if reader.fieldnames is None:
+            writer.writeheader()
+        elif reader.fieldnames != TUNING_HEADERS:
+            rows = list(reader)
+            fio.truncate(0)
+            writer.writeheader()
+            writer.writerows(rows)
+        writer.writerow(profile)
+
+
+def _parameters(profile):
+    # profiles from tests/profile_beamformsearch.py are at -C 1 -N 1
+    return (
+        profile["chanrate"],
+        profile["bfrate"],
+        profile.get("coarse_channels", None) or 1,
+        profile.get("workers", None) or 1,
+    )
+
+
+def _tuning_profiles(profiles, number_of_beams, hostname=None):
+    return [
+        profile
+        for profile in profiles
+        if profile["number_of_beams"] == number_of_beams
+        and (hostname is None or profile.get("hostname", hostname) == hostname)
+    ]
+
+
+def parameter_throughputs(profiles, number_of_beams, hostname=None):
+    """
+    Returns {(chanrate, bfrate, coarse_channels, workers): throughput} of
+    the profiles of the number_of_beams (and hostname, if given), the
+    throughput being the median of the input bytes (or runs, when no
+    input size was recorded) per elapsed second over successful runs.
+    Parameters that failed at least as often as they succeeded are left out.
+    """
+    profiles = _tuning_profiles(profiles, number_of_beams, hostname)
+    sized = any(profile.get("input_bytes", None) is not None for profile in profiles)
+
+    runs = {}
+    for profile in profiles:
+        if sized and profile.get("input_bytes", None) is None:
+            # not comparable with the sized runs
+            continue
+        runs.setdefault(_parameters(profile), []).append(profile)
+
+    throughputs = {}
+    for parameters, parameter_runs in runs.items():
+        successes = [
+            run
+            for run in parameter_runs
+            if run["successful"] and run["elapsed_s"] is not None and run["elapsed_s"] > 0
+        ]
+        if len(successes) == 0 or len(successes) <= len(parameter_runs) - len(successes):
+            continue
+        throughputs[parameters] = float(numpy.median([
+            (run.get("input_bytes", None) or 1) / run["elapsed_s"]
+            for run in successes
+        ]))
+    return throughputs
+
+
+def _neighbours(parameters, candidates):
+    neighbours = []
+    for axis, values in enumerate(candidates):
+        values = sorted(values)
+        if parameters[axis] not in values:
+            continue
+        position = values.index(parameters[axis])
+        for neighbour_position in [position - 1, position + 1]:
+            if 0 <= neighbour_position < len(values):
+                neighbour = list(parameters)
+                neighbour[axis] = values[neighbour_position]
+                neighbours.append(tuple(neighbour))
+    return neighbours
+
+
+def tune_parameters(
+    profiles,
+    number_of_beams,
+    default_parameters,
+    chanrates=None,
+    bfrates=None,
+    coarse_channel_rates=None,
+    worker_counts=None,
+    explore=0.0,
+    hostname=None,
+    rng=random,
+):
+    """
+    Picks the (chanrate, bfrate, coarse_channels, workers) of the highest
+    throughput (see `parameter_throughputs`) among the candidates, each
+    candidate list defaulting to the value of default_parameters (that is,
+    that parameter is not tuned). Without a recorded candidate, the
+    default_parameters are picked. With probability explore, a neighbour
+    of the pick (one parameter moved to the adjacent candidate value) is
+    picked instead, preferring neighbours that have not been recorded.
+
+    Return
+    ------
+        (chanrate, bfrate, coarse_channels, workers), whether it was explored
+    """
+    candidates = [
+        values if values is not None else [default]
+        for values, default in zip(
+            [chanrates, bfrates, coarse_channel_rates, worker_counts],
+            default_parameters
+        )
+    ]
+    recorded = {
+        parameters: throughput
+        for parameters, throughput in parameter_throughputs(profiles, number_of_beams, hostname).items()
+        if all(value in values for value, values in zip(parameters, candidates))
+    }
+    best = max(recorded, key=recorded.get) if len(recorded) > 0 else tuple(default_parameters)
+
+    if explore > 0 and rng.random() < explore:
+        neighbours = _neighbours(best, candidates)
+        tried = set(_parameters(profile) for profile in _tuning_profiles(profiles, number_of_beams, hostname))
+        untried = [neighbour for neighbour in neighbours if neighbour not in tried]
+        if len(untried) > 0:
+            return rng.choice(untried), True
+        if len(neighbours) > 0:
+            return rng.choice(neighbours), True
+    return best, False
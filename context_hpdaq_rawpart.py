@@ -1,8 +1,11 @@
 import os
 import glob
+import json
 import logging
+import tempfile
 import traceback
 import time
+import threading
 
 from Pypeline import ProcessNote
 from hashpipe_status_keyvalues import HashpipeStatusSharedMemoryIPC
@@ -47,6 +50,7 @@ STATE_prev_daq = DaqState.Unknown
 STATE_current_daq = DaqState.Unknown
 STATE_processed_parts = []
 STATE_parts_to_process = []
+STATE_speculation_thread = None
 
 
 def setup(hostname, instance, logger=None):
@@ -84,11 +88,103 @@ def rehydrate(dehydration_dict):
     STATE_parts_to_process = dehydration_dict["parts_to_process"]
 
 
+def _stage_parameters_filepath(instance, stage_name):
+    return os.path.join(tempfile.gettempdir(), f"{NAME}.{instance}.{stage_name}.json")
+
+
+def _record_stage_parameters(instance, stage_name, argstr, env, logger):
+    """
+    Records the arguments and environment a stage was given (as noted at
+    its start), for `_speculate_bfr5` to prepare with the stage's own. The
+    record is a file, as stages are noted in other processes than `run`'s.
+    """
+    filepath = _stage_parameters_filepath(instance, stage_name)
+    parameters = {"argstr": argstr, "env": env}
+    if _recorded_stage_parameters(instance, stage_name) == parameters:
+        return
+    try:
+        partial_filepath = f"{filepath}.{os.getpid()}.tmp"
+        with open(partial_filepath, "w") as fio:
+            json.dump(parameters, fio)
+        os.replace(partial_filepath, filepath)
+    except OSError as err:
+        logger.warning(f"Could not record the parameters of stage '{stage_name}': {err}")
+
+
+def _recorded_stage_parameters(instance, stage_name):
+    try:
+        with open(_stage_parameters_filepath(instance, stage_name), "r") as fio:
+            return json.load(fio)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _speculate_bfr5(stem_path, batch_length, instance, logger, first_part_timeout_s=600.0):
+    """
+    Prepares the BFR5 of the recording's first batch in the background (see
+    `run`), with the arguments and environment the bfr5_generate stage was
+    last given on this instance (see `_record_stage_parameters`):
+        - the static data is prepared from the first rawpart's header, as
+          soon as it is readable (`stage_bfr5_generate.prepare`),
+        - the BFR5 is generated through the stage's BFR5 registry, if it has
+          one, once the first rawpart is complete (as for processing, once
+          a second rawpart exists), for batches of a single rawpart only,
+          as only those match the first rawpart's BFR5
+          (`stage_bfr5_generate.speculate`).
+    """
+    parameters = _recorded_stage_parameters(instance, "bfr5_generate")
+    if parameters is None:
+        logger.info("The bfr5_generate stage has not run on this instance yet, not speculating.")
+        return
+
+    # imported here, as only speculation needs the stage's dependencies
+    import stage_bfr5_generate
+
+    start = time.monotonic()
+    while len(first_parts := sorted(glob.glob(f"{stem_path}*.????.raw"))) < 1:
+        if time.monotonic() - start > first_part_timeout_s:
+            logger.warning(f"No rawpart of '{stem_path}' within {first_part_timeout_s} s, not speculating.")
+            return
+        time.sleep(0.5)
+
+    try:
+        prepare_start = time.monotonic()
+        if stage_bfr5_generate.prepare(
+            parameters["argstr"],
+            first_parts[0:1],
+            parameters["env"],
+            logger=logger,
+            header_timeout_s=max(0.0, first_part_timeout_s - (prepare_start - start))
+        ):
+            logger.info(f"Speculative BFR5 static data prepared after {time.monotonic()-prepare_start:0.2f} s.")
+    except BaseException:
+        logger.warning(f"Speculative BFR5 static data preparation failed: {traceback.format_exc()}")
+
+    if not stage_bfr5_generate.registry_enabled(parameters["env"]):
+        return
+    if batch_length != 1:
+        logger.info(f"Batches are of {batch_length} rawparts, not generating the first rawpart's BFR5.")
+        return
+
+    while len(first_parts := sorted(glob.glob(f"{stem_path}*.????.raw"))) < 2:
+        if time.monotonic() - start > first_part_timeout_s:
+            logger.warning(f"The first rawpart of '{stem_path}' was not complete within {first_part_timeout_s} s, not generating its BFR5.")
+            return
+        time.sleep(0.5)
+
+    try:
+        generate_start = time.monotonic()
+        bfr5_filepath = stage_bfr5_generate.speculate(parameters["argstr"], first_parts[0:1], parameters["env"], logger=logger)
+        logger.info(f"Speculative BFR5 generation finished after {time.monotonic()-generate_start:0.2f} s: {bfr5_filepath}")
+    except BaseException:
+        logger.warning(f"Speculative BFR5 generation failed: {traceback.format_exc()}")
+
+
 def run(env=None, logger=None):
     if logger is None:
         logger = logging.getLogger(NAME)
     
-    global STATE_env, STATE_hpinstance, STATE_hpstatus_buffer, STATE_prev_daq, STATE_current_daq, STATE_processed_parts, STATE_parts_to_process, STATE_recording_exhausted
+    global STATE_env, STATE_hpinstance, STATE_hpstatus_buffer, STATE_prev_daq, STATE_current_daq, STATE_processed_parts, STATE_parts_to_process, STATE_recording_exhausted, STATE_speculation_thread
     # TODO probably ought to only do this when env is a different value
     STATE_env.clear()
     STATE_env.update(common.env_str_to_dict(env))
@@ -155,6 +251,21 @@ def run(env=None, logger=None):
         # STATE_recording_exhausted = False
         STATE_processed_parts.clear()
         logger.info(f"Recording has started. Initial parts: {all_parts}")
+        if (
+            STATE_env.get("SPECULATIVE_BFR5", "false").lower() == "true"
+            and (STATE_speculation_thread is None or not STATE_speculation_thread.is_alive())
+        ):
+            STATE_speculation_thread = threading.Thread(
+                target=_speculate_bfr5,
+                args=(
+                    stem_path,
+                    batch_length,
+                    STATE_hpinstance,
+                    logger,
+                ),
+                daemon=True
+            )
+            STATE_speculation_thread.start()
         if len(all_parts) > 1:
             # if more than one part, consider the first complete
             STATE_parts_to_process = all_parts[0:batch_length]
@@ -228,6 +339,13 @@ def note(processnote: ProcessNote, **kwargs):
     logger = kwargs["logger"]
 
     logger.debug(f"{processnote}")
+    if (
+        processnote == ProcessNote.StageStart
+        and kwargs["stage"].NAME == "bfr5_generate"
+        and STATE_env.get("SPECULATIVE_BFR5", "false").lower() == "true"
+    ):
+        _record_stage_parameters(STATE_hpinstance, "bfr5_generate", kwargs["argvalue"], kwargs["envvalue"], logger)
+
     if processnote in [ProcessNote.Error, ProcessNote.StageError]:
         if STATE_env.get("POSTPROC_REMOVE_FAILURES", "true").lower() != "false":
             for part_to_process in STATE_parts_to_process:
@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import fcntl
+import logging
+import subprocess
+import tempfile
+
+NAME = "gpu_lease"
+
+
+def _default_lease_directory():
+    for dirpath in ["/run/lock", tempfile.gettempdir()]:
+        if os.access(dirpath, os.W_OK):
+            return os.path.join(dirpath, "gpu_leases")
+    return os.path.join(tempfile.gettempdir(), "gpu_leases")
+
+
+def query_nvidia_smi(command="nvidia-smi"):
+    """
+    Queries the devices with `{command} --query-gpu=index,memory.total,memory.free --format=csv,noheader,nounits`.
+
+    Return
+    ------
+        [{"index": int, "memory_total_MiB": int, "memory_free_MiB": int}, ...]
+
+    Raises
+    ------
+        RuntimeError: if the command fails
+    """
+    output = subprocess.run(
+        command.split(" ") + [
+            "--query-gpu=index,memory.total,memory.free",
+            "--format=csv,noheader,nounits"
+        ],
+        capture_output=True
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"Device query failed: {output.stderr.decode().strip()}")
+
+    devices = []
+    for line in output.stdout.decode().strip().split("\n"):
+        if len(line.strip()) == 0:
+            continue
+        index, memory_total, memory_free = (value.strip() for value in line.split(","))
+        devices.append({
+            "index": int(index),
+            "memory_total_MiB": int(memory_total),
+            "memory_free_MiB": int(memory_free),
+        })
+    return devices
+
+
+def query_nvidia_smi_processes(command="nvidia-smi"):
+    """
+    Queries the compute processes with `{command} --query-compute-apps=pid,used_memory --format=csv,noheader,nounits`.
+
+    Return
+    ------
+        {pid: used MiB (summed over the devices)}
+
+    Raises
+    ------
+        RuntimeError: if the command fails
+    """
+    output = subprocess.run(
+        command.split(" ") + [
+            "--query-compute-apps=pid,used_memory",
+            "--format=csv,noheader,nounits"
+        ],
+        capture_output=True
+    )
+    if output.returncode != 0:
+        raise RuntimeError(f"Process query failed: {output.stderr.decode().strip()}")
+
+    processes = {}
+    for line in output.stdout.decode().strip().split("\n"):
+        if len(line.strip()) == 0:
+            continue
+        pid, used_memory = (value.strip() for value in line.split(","))
+        try:
+            used_memory = int(used_memory)
+        except ValueError:
+            # "[N/A]" without the privileges to see it
+            continue
+        processes[int(pid)] = processes.get(int(pid), 0) + used_memory
+    return processes
+
+
+class GpuLease:
+    """
+    A lease of a GPU, held (by an exclusive lock on its lease file) until
+    released or until the holding process exits. Use as a context manager.
+
+    The process the GPU is leased for is recorded with `set_process`, so
+    that the memory it has allocated is not counted twice (see
+    `GpuLeaseManager`).
+    """
+    def __init__(self, index, memory_MiB, filepath, fileobj, manager_lock_filepath=None):
+        self.index = index
+        self.memory_MiB = memory_MiB
+        self.filepath = filepath
+        self.process_pid = None
+        self._fileobj = fileobj
+        self._manager_lock_filepath = manager_lock_filepath
+
+    def _lease_record(self):
+        return {
+            "index": self.index,
+            "memory_MiB": self.memory_MiB,
+            "pid": os.getpid(),
+            "process_pid": self.process_pid,
+        }
+
+    def set_process(self, pid):
+        """
+        Records the (child) process that allocates the leased memory.
+        """
+        self.process_pid = pid
+        if self._fileobj is None:
+            return
+        # under the manager lock, so the record is never read half-written
+        with open(self._manager_lock_filepath, "a") as manager_lock:
+            fcntl.flock(manager_lock, fcntl.LOCK_EX)
+            self._fileobj.seek(0)
+            self._fileobj.truncate()
+            json.dump(self._lease_record(), self._fileobj)
+            self._fileobj.flush()
+
+    def release(self):
+        if self._fileobj is None:
+            return
+        try:
+            os.remove(self.filepath)
+        except FileNotFoundError:
+            pass
+        # closing the file releases the lock
+        self._fileobj.close()
+        self._fileobj = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __repr__(self):
+        return f"GpuLease(index={self.index}, memory_MiB={self.memory_MiB}, process_pid={self.process_pid}, filepath='{self.filepath}')"
+
+
+class GpuLeaseManager:
+    """
+    Host-local GPU leases, coordinated by file locks in a lease directory:
+    a manager lock serialises the selection of devices and every lease
+    is a file holding its memory claim, exclusively locked by its holder.
+    Lease files are locked before they appear under their name, so a
+    lease file that can be locked belongs to a process that has exited
+    without releasing it, and is removed (under the manager lock).
+
+    Devices are selected by the memory available to a new lease, being
+    the free memory (as queried) less the part of each live lease's claim
+    that its process has not yet allocated. Memory used outside of leases
+    is so accounted by the free memory, as is that allocated by leased
+    processes, up to their claims.
+
+    The queries are pluggable: `query_devices` is any callable returning
+    the devices as `query_nvidia_smi` does, `query_processes` any
+    returning the memory used per process as `query_nvidia_smi_processes`
+    does.
+    """
+    def __init__(
+        self,
+        directory=None,
+        query_devices=query_nvidia_smi,
+        query_processes=query_nvidia_smi_processes,
+        logger=None
+    ):
+        self.directory = directory if directory is not None else _default_lease_directory()
+        self.query_devices = query_devices
+        self.query_processes = query_processes
+        self.logger = logger if logger is not None else logging.getLogger(NAME)
+        self.manager_lock_filepath = os.path.join(self.directory, "manager.lock")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _live_leases(self):
+        """
+        Returns {device-index: [lease record, ...]} of the live leases,
+        removing the stale lease files. Called under the manager lock.
+        """
+        leases = {}
+        for filename in os.listdir(self.directory):
+            if not filename.endswith((".lease", ".lease.tmp")):
+                continue
+            filepath = os.path.join(self.directory, filename)
+            try:
+                with open(filepath, "r") as fio:
+                    try:
+                        fcntl.flock(fio, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        if filename.endswith(".lease"):
+                            lease = json.load(fio)
+                            leases.setdefault(lease["index"], []).append(lease)
+                        continue
+                    # lockable, so its holder exited without releasing it
+                    self.logger.warning(f"Removing stale GPU lease: {filepath}")
+                    os.remove(filepath)
+            except (FileNotFoundError, json.JSONDecodeError):
+                # released
+                continue
+        return leases
+
+    def _available_memory(self, devices=None):
+        if devices is None:
+            devices = self.query_devices()
+        leases = self._live_leases()
+        processes = self.query_processes() if len(leases) > 0 else {}
+        return {
+            device["index"]: device["memory_free_MiB"] - sum(
+                max(0, lease["memory_MiB"] - processes.get(lease.get("process_pid", None), 0))
+                for lease in leases.get(device["index"], [])
+            )
+            for device in devices
+        }
+
+    def available_memory(self, devices=None):
+        """
+        Return
+        ------
+            {device-index: MiB available to a new lease}
+        """
+        with open(self.manager_lock_filepath, "a") as manager_lock:
+            fcntl.flock(manager_lock, fcntl.LOCK_EX)
+            return self._available_memory(devices)
+
+    def _try_acquire(self, memory_MiB, candidate_indices):
+        with open(self.manager_lock_filepath, "a") as manager_lock:
+            fcntl.flock(manager_lock, fcntl.LOCK_EX)
+
+            available = self._available_memory()
+            if candidate_indices is not None:
+                available = {
+                    index: MiB
+                    for index, MiB in available.items()
+                    if index in candidate_indices
+                }
+            self.logger.debug(f"Available GPU memory (MiB): {available}")
+            fitting = [index for index, MiB in available.items() if MiB >= memory_MiB]
+            if len(fitting) == 0:
+                return None
+            index = max(fitting, key=lambda index: available[index])
+
+            filepath = os.path.join(self.directory, f"gpu{index}.{os.getpid()}.{time.monotonic_ns()}.lease")
+            # locked before it is named as a lease, so it is never taken as stale
+            fileobj = open(f"{filepath}.tmp", "w")
+            fcntl.flock(fileobj, fcntl.LOCK_EX)
+            lease = GpuLease(index, memory_MiB, filepath, fileobj, self.manager_lock_filepath)
+            json.dump(lease._lease_record(), fileobj)
+            fileobj.flush()
+            os.rename(f"{filepath}.tmp", filepath)
+            self.logger.info(f"Leased GPU #{index} for {memory_MiB} MiB ({available[index]} MiB were available).")
+            return lease
+
+    def acquire(self, memory_MiB=0, candidate_indices=None, timeout_s=0.0, poll_interval_s=1.0):
+        """
+        Leases the candidate device (any by default) with the most
+        available memory, of at least memory_MiB, waiting up to timeout_s
+        for one to become available.
+
+        Raises
+        ------
+            TimeoutError: if no candidate has the memory available in time
+        """
+        start = time.monotonic()
+        while True:
+            lease = self._try_acquire(memory_MiB, candidate_indices)
+            if lease is not None:
+                return lease
+            if time.monotonic() - start >= timeout_s:
+                raise TimeoutError(f"No GPU (of {candidate_indices}) has {memory_MiB} MiB available after {timeout_s} s.")
+            time.sleep(poll_interval_s)
@@ -4,10 +4,15 @@ import os
 import argparse
 import logging
 import re
+import socket
+import time
 
+import h5py
 from Pypeline import replace_keywords
 
 import common
+import gpu_lease
+import blade_profiles
 
 ENV_KEY = "BeamformSearchENV"
 ARG_KEY = "BeamformSearchARG"
@@ -47,6 +52,143 @@ def _select_gpu_with_most_memory(logger, gpu_share_index, gpu_shares):
         logger.info(f"Selected device #{nvidia_id} with {nvidia_memfree} MiB free.")
     return nvidia_id
 
+def _share_device_indices(device_indices, gpu_share_index, gpu_shares):
+    """
+    Returns the device indices of the share. With more shares than devices,
+    every share is given all devices (leases keep the shares from colliding).
+    """
+    gpu_per_share = len(device_indices) // gpu_shares
+    if gpu_per_share == 0:
+        return list(device_indices)
+    gpu_row_start = gpu_share_index*gpu_per_share
+    return list(device_indices)[gpu_row_start : gpu_row_start+gpu_per_share]
+
+
+def _bfr5_number_of_beams(bfr5_filepath):
+    with h5py.File(bfr5_filepath, "r") as bfr5:
+        return len(bfr5["beaminfo"]["ras"])
+
+
+def _admit_job(logger, args, bfr5_filepath, manager, candidate_indices):
+    """
+    Predicts the GPU memory of the job with the memory model (setting
+    args.gpu_memory_mib), degrading args.beamform_time to fit when no
+    candidate device could ever fit it, or (with "--gpu-admission degrade")
+    when none has the memory available now.
+
+    Raises
+    ------
+        RuntimeError: if the job cannot fit any candidate device
+    """
+    model = blade_profiles.BladeMemoryModel.from_csv(args.gpu_memory_model)
+    number_of_beams = _bfr5_number_of_beams(bfr5_filepath)
+    args.gpu_memory_mib = model.predict(
+        args.channelization_rate,
+        args.beamform_time,
+        number_of_beams,
+        args.coarse_channel_ingest_rate,
+        args.number_of_workers
+    )
+    logger.info(f"Predicted GPU memory of {args.gpu_memory_mib} MiB for -c {args.channelization_rate} -T {args.beamform_time} -C {args.coarse_channel_ingest_rate} -N {args.number_of_workers} with {number_of_beams} beams.")
+
+    devices = [device for device in manager.query_devices() if device["index"] in candidate_indices]
+    total_MiB = max(device["memory_total_MiB"] for device in devices)
+    fit_MiB = total_MiB
+    if args.gpu_admission == "degrade":
+        fit_MiB = min(total_MiB, max(manager.available_memory(devices).values()))
+    if args.gpu_memory_mib <= fit_MiB:
+        return
+
+    bfrate = model.largest_bfrate(
+        args.channelization_rate,
+        number_of_beams,
+        fit_MiB,
+        args.beamform_time,
+        args.coarse_channel_ingest_rate,
+        args.number_of_workers
+    )
+    if bfrate is None:
+        if args.gpu_memory_mib <= total_MiB:
+            logger.info(f"Cannot degrade to fit {fit_MiB} MiB, queueing instead.")
+            return
+        raise RuntimeError(f"The job cannot fit the GPUs {candidate_indices}, even at -T 1.")
+
+    logger.warning(f"Degrading -T {args.beamform_time} to -T {bfrate} to fit {fit_MiB} MiB.")
+    args.beamform_time = bfrate
+    args.gpu_memory_mib = model.predict(
+        args.channelization_rate,
+        args.beamform_time,
+        number_of_beams,
+        args.coarse_channel_ingest_rate,
+        args.number_of_workers
+    )
+
+
+def _autotune(logger, args, bfr5_filepath):
+    """
+    Sets the -c/-T/-C/-N of args to the tuned parameters, returning the
+    number of beams.
+    """
+    number_of_beams = _bfr5_number_of_beams(bfr5_filepath)
+    profiles = []
+    if os.path.exists(args.autotune_store):
+        profiles = blade_profiles.load_profiles(args.autotune_store)
+
+    default_parameters = (
+        args.channelization_rate,
+        args.beamform_time,
+        args.coarse_channel_ingest_rate,
+        args.number_of_workers,
+    )
+    parameters, explored = blade_profiles.tune_parameters(
+        profiles,
+        number_of_beams,
+        default_parameters,
+        chanrates=args.autotune_chanrates,
+        bfrates=args.autotune_bfrates,
+        coarse_channel_rates=args.autotune_coarse_channel_rates,
+        worker_counts=args.autotune_workers,
+        explore=args.autotune_explore,
+        hostname=socket.gethostname(),
+    )
+    (
+        args.channelization_rate,
+        args.beamform_time,
+        args.coarse_channel_ingest_rate,
+        args.number_of_workers,
+    ) = parameters
+    logger.info(
+        f"Auto-tuned -c {parameters[0]} -T {parameters[1]} -C {parameters[2]} -N {parameters[3]} for {number_of_beams} beams"
+        + (" (exploring)." if explored else f" (from {len(profiles)} recorded runs).")
+    )
+    return number_of_beams
+
+
+def _lease_gpu(logger, args, bfr5_filepath):
+    manager = gpu_lease.GpuLeaseManager(
+        directory=args.gpu_lease_directory,
+        query_devices=lambda: gpu_lease.query_nvidia_smi(args.gpu_query_command),
+        query_processes=lambda: gpu_lease.query_nvidia_smi_processes(args.gpu_query_command),
+        logger=logger
+    )
+    if args.gpu_id is not None:
+        candidate_indices = [args.gpu_id]
+    else:
+        candidate_indices = _share_device_indices(
+            [device["index"] for device in manager.query_devices()],
+            args.gpu_share_index,
+            args.gpu_shares
+        )
+    if args.gpu_memory_model is not None:
+        _admit_job(logger, args, bfr5_filepath, manager, candidate_indices)
+    logger.info(f"Leasing one of GPUs {candidate_indices} for {args.gpu_memory_mib} MiB.")
+    return manager.acquire(
+        memory_MiB=args.gpu_memory_mib,
+        candidate_indices=candidate_indices,
+        timeout_s=args.gpu_lease_timeout
+    )
+
+
 def _add_args(parser):
     parser.add_argument(
         "-c",
@@ -136,6 +278,88 @@ def _add_args(parser):
         action="store_true",
         help="Target the GPU with the most free memory.",
     )
+    parser.add_argument(
+        "--gpu-lease",
+        action="store_true",
+        help="Lease the GPU (of the share) with the most memory available, for the life of BLADE, coordinating with other instances on the host.",
+    )
+    parser.add_argument(
+        "--gpu-memory-mib",
+        type=int,
+        default=0,
+        help="The GPU memory (MiB) to lease, required by --gpu-lease unless --gpu-memory-model is given.",
+    )
+    parser.add_argument(
+        "--gpu-memory-model",
+        type=str,
+        default=None,
+        help="A blade_profiles.csv (see tests/profile_beamformsearch.py) to predict the GPU memory to lease from, instead of --gpu-memory-mib.",
+    )
+    parser.add_argument(
+        "--gpu-admission",
+        type=str,
+        choices=["queue", "degrade"],
+        default="queue",
+        help="Whether a job that does not fit the available GPU memory waits for it, or has its -T degraded to fit (predicted with --gpu-memory-model).",
+    )
+    parser.add_argument(
+        "--gpu-lease-timeout",
+        type=float,
+        default=600.0,
+        help="How long to wait for the GPU memory to become available (seconds).",
+    )
+    parser.add_argument(
+        "--gpu-lease-directory",
+        type=str,
+        default=None,
+        help="The directory of the GPU leases (default: /run/lock/gpu_leases, or under the temporary directory).",
+    )
+    parser.add_argument(
+        "--gpu-query-command",
+        type=str,
+        default="nvidia-smi",
+        help="The nvidia-smi compatible command to query the GPUs with.",
+    )
+    parser.add_argument(
+        "--autotune-store",
+        type=str,
+        default=None,
+        help="Auto-tune -c/-T/-C/-N from, and record each run to, this blade_profiles.csv-shaped results store.",
+    )
+    parser.add_argument(
+        "--autotune-chanrates",
+        type=int,
+        nargs="+",
+        default=None,
+        help="The -c values the auto-tuner may pick (default: only -c).",
+    )
+    parser.add_argument(
+        "--autotune-bfrates",
+        type=int,
+        nargs="+",
+        default=None,
+        help="The -T values the auto-tuner may pick (default: only -T).",
+    )
+    parser.add_argument(
+        "--autotune-coarse-channel-rates",
+        type=int,
+        nargs="+",
+        default=None,
+        help="The -C values the auto-tuner may pick (default: only -C).",
+    )
+    parser.add_argument(
+        "--autotune-workers",
+        type=int,
+        nargs="+",
+        default=None,
+        help="The -N values the auto-tuner may pick (default: only -N).",
+    )
+    parser.add_argument(
+        "--autotune-explore",
+        type=float,
+        default=0.0,
+        help="The probability of exploring a neighbouring parameter set instead of the best recorded.",
+    )
     parser.add_argument(
         "-pl",
         "--gpu-power-limit",
@@ -218,6 +442,17 @@ def run(argstr, inputs, env, logger=None):
     argstr = replace_keywords(CONTEXT, argstr)
     args = parser.parse_args(argstr.split(" "))
 
+    if args.autotune_store is not None:
+        number_of_beams = _autotune(logger, args, inputs[1])
+
+    lease = None
+    if args.gpu_lease:
+        if args.gpu_memory_mib <= 0 and args.gpu_memory_model is None:
+            # a claim of nothing would lease any device, however many jobs it holds
+            raise ValueError(f"{NAME} requires --gpu-memory-mib or --gpu-memory-model with --gpu-lease.")
+        # before the command is built, as admission may degrade -T
+        lease = _lease_gpu(logger, args, inputs[1])
+
     cmd = [
         "blade-cli",
         "-P", # disable progress-bar
@@ -255,7 +490,9 @@ def run(argstr, inputs, env, logger=None):
     # logger.info(f"env: {env_base}")
 
     nvidia_id = args.gpu_id
-    if args.gpu_target_most_memory:
+    if lease is not None:
+        nvidia_id = lease.index
+    elif args.gpu_target_most_memory:
         nvidia_id = _select_gpu_with_most_memory(
             logger,
             args.gpu_share_index,
@@ -284,7 +521,44 @@ def run(argstr, inputs, env, logger=None):
         #     logger.error(output.stdout.decode())
 
     logger.debug(f"{cmd}")
-    output = subprocess.run(cmd, env=env_base, capture_output=True)
+    start = time.time()
+    try:
+        with subprocess.Popen(cmd, env=env_base, stdout=subprocess.PIPE, stderr=subprocess.PIPE) as process:
+            if lease is not None:
+                # its allocations then count towards the lease's claim
+                lease.set_process(process.pid)
+            stdout, stderr = process.communicate()
+        output = subprocess.CompletedProcess(cmd, process.returncode, stdout, stderr)
+    finally:
+        if lease is not None:
+            lease.release()
+    elapsed_s = time.time() - start
+
+    outputs = glob.glob(f"{args.output_stempath}.seticore.*")
+    outputs.extend(glob.glob(f"{args.output_stempath}-beam*.fil"))
+
+    if args.autotune_store is not None:
+        blade_profiles.record_profile(
+            args.autotune_store,
+            {
+                "chanrate": args.channelization_rate,
+                "bfrate": args.beamform_time,
+                "elapsed_s": elapsed_s,
+                "number_of_beams": number_of_beams,
+                # not measured (a leased amount is a prediction)
+                "gpu_memuse_MiB": -1,
+                "successful": output.returncode == 0,
+                "coarse_channels": args.coarse_channel_ingest_rate,
+                "workers": args.number_of_workers,
+                "input_bytes": sum(
+                    os.path.getsize(raw_filepath)
+                    for raw_filepath in raw_filespaths
+                    if os.path.exists(raw_filepath)
+                ) or None, # unknown for a stem
+                "outputs": len(outputs),
+                "hostname": socket.gethostname(),
+            }
+        )
     stdoutput = output.stdout.decode().strip()
     stdoutput_last_line = stdoutput.split('\n')[-1]
     logger.info(f"Last stdout line: `{stdoutput_last_line}`")
@@ -297,9 +571,6 @@ def run(argstr, inputs, env, logger=None):
         logger.error(stderr_output.strip())
         raise RuntimeError(stderr_output)
 
-    outputs = glob.glob(f"{args.output_stempath}.seticore.*")
-    outputs.extend(glob.glob(f"{args.output_stempath}-beam*.fil"))
-
     if args.log_blade_output:
         log_outputfilepath = f"{args.output_stempath}.blade.stdout.txt"
         with open(log_outputfilepath, "w") as fio:
@@ -1,7 +1,13 @@
 #!/usr/bin/env python
 import logging, os, json
+import hashlib
+import shutil
+import socket
+import tempfile
 import time
 import tomli_w
+import h5py
+import numpy
 
 import bfr5genie
 from bfr5genie import entrypoints
@@ -10,21 +16,46 @@ import redis
 import re
 
 import common
+import bfr5_aux
 
 ENV_KEY = "BFR5GenerateENV"
 ARG_KEY = "BFR5GenerateARG"
 INP_KEY = "BFR5GenerateINP"
 NAME = "bfr5_generate"
 
+# obsid -> {metadata_signature, telinfo, telinfo_digest, written}, see `_setup_telinfo`
+_OBSMETA_CACHE = {}
+_OBSMETA_CACHE_MAX_ENTRIES = 16
 
-def dump_telescope_info(
-    output_path,
+# (host, port) -> redis.ConnectionPool, see `_get_redis`
+_REDIS_POOLS = {}
+TARGETS_WAIT_TIMEOUT_S = 10.0
+
+# the BFR5 templates of the most recent pointings kept, see `_store_pointing_bfr5`
+_POINTING_BFR5_CACHE_MAX_ENTRIES = 4
+# the attributes of a template recording what it covers
+_POINTING_BFR5_ATTRS = ["pointing_start_time", "pointing_times", "pointing_rawpart_count", "pointing_bfr5_filepath"]
+# the most a template's recomputed delays may differ from its stored delays
+POINTING_BFR5_MAX_DELAY_ERROR_NS = 1e-3
+
+BFR5_REGISTRY_WAIT_TIMEOUT_S = 120.0
+BFR5_REGISTRY_CLAIM_TTL_S = 300
+BFR5_REGISTRY_RESULT_TTL_S = 24*3600
+# the header fields that place a batch in its band, see `_adapt_subband_bfr5`
+SUBBAND_HEADER_KEYS = ["OBSFREQ", "OBSBW", "SCHAN", "OBSNCHAN"]
+
+
+def telescope_info_toml(
     antenna_properties,
     array_configuration = None,
     timestamp = time.time(),
     dataset_id = None,
     logger=None
 ):
+    """
+    Returns the telescope-information TOML document (str) that
+    `dump_telescope_info` writes.
+    """
     telinfo_dict = {
         "telescope_name": "VLA",
         # Geodetic location of telescope reference point.  `latitude` and `longitude`
@@ -83,42 +114,522 @@ def dump_telescope_info(
             "diameter": antProps["diameter"]["value"],
             "position": [antProps["X"]["value"], antProps["Y"]["value"], antProps["Z"]["value"]]
         })
+    return tomli_w.dumps(telinfo_dict)
+
+
+def dump_telescope_info(
+    output_path,
+    antenna_properties,
+    array_configuration = None,
+    timestamp = time.time(),
+    dataset_id = None,
+    logger=None
+):
     with open(output_path, "wb") as fio:
-        tomli_w.dump(telinfo_dict, fio)
+        fio.write(
+            telescope_info_toml(
+                antenna_properties,
+                array_configuration,
+                timestamp,
+                dataset_id,
+                logger=logger
+            ).encode()
+        )
 
 
-def retroactive_setup_for_target_gen(arg_values, inputs, logger=None):
-    # creates telinfo file, requests targets and manipulates arg_values
-    parser = entrypoints._base_arguments_parser()
-    entrypoints._add_arguments_targetselector(parser)
-    entrypoints._add_arguments_beams(parser)
-    arg_namespace = parser.parse_args(arg_values+inputs)
+def _file_signature(filepath):
+    """
+    Returns (inode, modification-time, size) of the file, or None if it does not exist.
+    """
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
 
-    rawfile_dir, rawfile_name = os.path.split(inputs[0])
 
-    grh = GuppiRawHandler(inputs[0])
-    grh.open_next_file()
-    hdr = grh.read_next_header()
+def _file_digest(filepath):
+    with open(filepath, "rb") as fio:
+        return hashlib.sha256(fio.read()).hexdigest()
 
-    obsid = hdr.get("OBSID", None)
-    if obsid is None:
-        obsid = re.match(r"(.*)\.(AC|BD)\.C\d{3,4}\.\d{4}\.raw", rawfile_name).group(1)
 
-    obsmeta_filepath = f"/home/cosmic/dev/logs/obs_meta/{obsid}_metadata.json"
-    telinfo_output_path = os.path.join(rawfile_dir, f"{obsid}.telinfo.toml")
+def _setup_telinfo(obsid, obsmeta_filepath, telinfo_output_path, logger=None):
+    """
+    Writes the telescope-information of the obsid's metadata to telinfo_output_path.
+
+    The metadata is only parsed when its file's signature (inode, mtime, size)
+    has changed since the obsid was last seen, and the telinfo file is only
+    rewritten when its content would change: a file this process wrote and
+    that has not since been touched is trusted by its signature, any other
+    existing file by its hash.
+
+    Return
+    ------
+        bool: whether the telinfo file was (re)written
+    """
+    metadata_signature = _file_signature(obsmeta_filepath)
+    if metadata_signature is None:
+        raise FileNotFoundError(obsmeta_filepath)
 
-    with open(obsmeta_filepath, "r") as fio:
-        metadata = json.load(fio)
+    cached = _OBSMETA_CACHE.get(obsid)
+    if cached is None or cached["metadata_signature"] != metadata_signature:
+        with open(obsmeta_filepath, "r") as fio:
+            metadata = json.load(fio)
         if logger is not None:
             logger.debug(f"json.load('{obsmeta_filepath}'): {metadata}")
 
-        dump_telescope_info(
-            telinfo_output_path,
+        telinfo = telescope_info_toml(
             metadata["META_ANT"]["AntennaProperties"],
             metadata["META_ANT"]["datasetId"],
             metadata["META_ANT"]["creation"],
             metadata["META_ANT"]["configuration"],
+        ).encode()
+        cached = {
+            "metadata_signature": metadata_signature,
+            "telinfo": telinfo,
+            "telinfo_digest": hashlib.sha256(telinfo).hexdigest(),
+            "written": {}, # telinfo filepath -> signature after writing
+        }
+        _OBSMETA_CACHE.pop(obsid, None)
+        _OBSMETA_CACHE[obsid] = cached
+        while len(_OBSMETA_CACHE) > _OBSMETA_CACHE_MAX_ENTRIES:
+            _OBSMETA_CACHE.pop(next(iter(_OBSMETA_CACHE)))
+    elif logger is not None:
+        logger.debug(f"Reusing the metadata parsed from '{obsmeta_filepath}'.")
+
+    telinfo_signature = _file_signature(telinfo_output_path)
+    if telinfo_signature is not None and (
+        cached["written"].get(telinfo_output_path) == telinfo_signature
+        or _file_digest(telinfo_output_path) == cached["telinfo_digest"]
+    ):
+        if logger is not None:
+            logger.debug(f"Telescope information is unchanged, not rewriting '{telinfo_output_path}'.")
+        cached["written"][telinfo_output_path] = telinfo_signature
+        return False
+
+    with open(telinfo_output_path, "wb") as fio:
+        fio.write(cached["telinfo"])
+    cached["written"][telinfo_output_path] = _file_signature(telinfo_output_path)
+    return True
+
+
+def _get_redis(host, port):
+    """
+    Returns a Redis client on the (process-wide) connection pool of host:port.
+    """
+    pool = _REDIS_POOLS.get((host, port))
+    if pool is None:
+        pool = redis.ConnectionPool(host=host, port=port)
+        _REDIS_POOLS[(host, port)] = pool
+    return redis.Redis(connection_pool=pool)
+
+
+def wait_for_redis_key(
+    redis_obj,
+    key,
+    timeout_s = TARGETS_WAIT_TIMEOUT_S,
+    poll_interval_s = 0.005,
+    poll_interval_max_s = 0.25,
+    while_key = None,
+    logger=None
+):
+    """
+    Polls for the key to exist, backing off exponentially from poll_interval_s
+    to poll_interval_max_s between polls. Only `redis_obj.exists` is used.
+    With while_key, the wait is abandoned as soon as while_key does not exist.
+
+    Return
+    ------
+        float: the seconds waited, or None if the wait was abandoned
+
+    Raises
+    ------
+        TimeoutError: if the key does not exist within timeout_s
+    """
+    start = time.monotonic()
+    while True:
+        if redis_obj.exists(key):
+            waited = time.monotonic() - start
+            if logger is not None:
+                logger.debug(f"Redis key '{key}' exists after {waited:0.3f} s.")
+            return waited
+        if while_key is not None and not redis_obj.exists(while_key):
+            if logger is not None:
+                logger.debug(f"Redis key '{while_key}' no longer exists, abandoning the wait for '{key}'.")
+            return None
+
+        remaining = timeout_s - (time.monotonic() - start)
+        if remaining <= 0:
+            raise TimeoutError(f"Redis key '{key}' did not appear within {timeout_s} s.")
+        time.sleep(min(poll_interval_s, remaining))
+        poll_interval_s = min(2*poll_interval_s, poll_interval_max_s)
+
+
+def _read_raw_header(raw_filepath):
+    grh = GuppiRawHandler(raw_filepath)
+    grh.open_next_file()
+    return grh.read_next_header()
+
+
+def _raw_obsid(hdr, raw_filepath):
+    obsid = hdr.get("OBSID", None)
+    if obsid is None:
+        obsid = re.match(r"(.*)\.(AC|BD)\.C\d{3,4}\.\d{4}\.raw", os.path.basename(raw_filepath)).group(1)
+    return obsid
+
+
+def _raw_start_time(hdr):
+    """
+    Returns the unix time of the header's PKTIDX.
+    """
+    tbin = hdr["TBIN"]
+    if hdr.get("PKTNTIME", None) is not None:
+        pktidx_duration = hdr["PKTNTIME"]*tbin
+    else:
+        npol = 2 if hdr["NPOL"] == 4 else hdr["NPOL"]
+        block_ntime = hdr["BLOCSIZE"]*8 // (hdr["OBSNCHAN"]*npol*2*hdr["NBITS"])
+        pktidx_duration = block_ntime*tbin/hdr["PIPERBLK"]
+    return hdr.get("SYNCTIME", 0) + hdr["PKTIDX"]*pktidx_duration
+
+
+def _pointing_key(argstr, hdr, raw_filepath):
+    return (
+        _raw_obsid(hdr, raw_filepath),
+        hdr.source_name,
+        round(hdr.rightascension_hours*180/12, 6),
+        round(hdr.declination_degrees, 6),
+        argstr,
+    )
+
+
+def _batch_bfr5_filepath(dirpath, inputs):
+    return os.path.join(
+        dirpath,
+        f"{os.path.splitext(os.path.basename(inputs[0]))[0]}.bfr5"
+    )
+
+
+def _pointing_template_filepath(cache_dirpath, key):
+    return os.path.join(
+        cache_dirpath,
+        f"{hashlib.sha256(repr(key).encode()).hexdigest()[:32]}.bfr5"
+    )
+
+
+def _evict_pointing_templates(cache_dirpath, logger):
+    templates = []
+    for filename in os.listdir(cache_dirpath):
+        if not filename.endswith(".bfr5"):
+            continue
+        filepath = os.path.join(cache_dirpath, filename)
+        if (signature := _file_signature(filepath)) is not None:
+            templates.append((signature[1], filepath))
+    templates.sort()
+    for _, filepath in templates[:max(0, len(templates) - _POINTING_BFR5_CACHE_MAX_ENTRIES)]:
+        try:
+            os.remove(filepath)
+            logger.debug(f"Evicted the BFR5 template '{filepath}'.")
+        except FileNotFoundError:
+            pass
+
+
+def _store_pointing_bfr5(argstr, inputs, bfr5_filepath, cache_dirpath, logger):
+    """
+    Keeps a template copy of the BFR5 generated for the batch of inputs in
+    cache_dirpath, named by its pointing, so that later batches of the same
+    pointing can reuse it (see `_reuse_pointing_bfr5`), in any process.
+    The template records the start time, time grid and rawpart count of the
+    batch as attributes. The BFR5 is only kept if its geometry reproduces
+    its delays, within POINTING_BFR5_MAX_DELAY_ERROR_NS. Errors are
+    logged, the BFR5 then not being kept. Only the most recently used
+    _POINTING_BFR5_CACHE_MAX_ENTRIES templates are kept.
+    """
+    partial_filepath = None
+    try:
+        geometry = bfr5_aux.read_bfr5_geometry(bfr5_filepath)
+        with h5py.File(bfr5_filepath, "r") as bfr5:
+            times = bfr5["delayinfo"]["time_array"][:]
+            delays_ns = bfr5["delayinfo"]["delays"][:]
+            has_phasors = "phasorinfo" in bfr5
+
+        if has_phasors:
+            logger.warning(f"Not reusing '{bfr5_filepath}' for the pointing: it holds phasors.")
+            return
+        delay_error_ns = numpy.max(numpy.abs(bfr5_aux.delays(times=times, **geometry) - delays_ns))
+        if delay_error_ns > POINTING_BFR5_MAX_DELAY_ERROR_NS:
+            logger.warning(f"Not reusing '{bfr5_filepath}' for the pointing: its delays are not reproduced (error {delay_error_ns} ns).")
+            return
+
+        hdr = _read_raw_header(inputs[0])
+        key = _pointing_key(argstr, hdr, inputs[0])
+        os.makedirs(cache_dirpath, exist_ok=True)
+        template_filepath = _pointing_template_filepath(cache_dirpath, key)
+        # completed aside and renamed, as other processes may be reading the template
+        partial_filepath = f"{template_filepath}.{os.getpid()}.tmp"
+        shutil.copyfile(bfr5_filepath, partial_filepath)
+        with h5py.File(partial_filepath, "a") as template:
+            template.attrs["pointing_start_time"] = _raw_start_time(hdr)
+            template.attrs["pointing_times"] = times
+            template.attrs["pointing_rawpart_count"] = len(inputs)
+            template.attrs["pointing_bfr5_filepath"] = bfr5_filepath
+        os.replace(partial_filepath, template_filepath)
+        _evict_pointing_templates(cache_dirpath, logger)
+    except Exception as err:
+        logger.warning(f"Not reusing '{bfr5_filepath}' for the pointing: {err}")
+        if partial_filepath is not None and os.path.exists(partial_filepath):
+            os.remove(partial_filepath)
+        return
+    logger.debug(f"Kept '{template_filepath}' as the BFR5 template of pointing {key}.")
+
+
+def _reuse_pointing_bfr5(argstr, inputs, cache_dirpath, logger):
+    """
+    Returns the BFR5 filepath for the batch of inputs from the template
+    BFR5 of its pointing in cache_dirpath, or None when there is no
+    template, the batch holds more rawparts than the template covers or
+    reusing it errs (the error is logged), for the BFR5 to be generated as
+    usual.
+
+    The template's time grid is shifted by the batch's start offset and only
+    the delayinfo datasets are regenerated (`bfr5_aux.write_bfr5_delays`),
+    the targets and beams are kept. A batch that starts where the
+    template's did is covered by the template's BFR5 as it stands.
+    """
+    try:
+        hdr = _read_raw_header(inputs[0])
+        template_filepath = _pointing_template_filepath(cache_dirpath, _pointing_key(argstr, hdr, inputs[0]))
+        try:
+            # the open template is copied, should it be replaced meanwhile
+            fio = open(template_filepath, "rb")
+        except FileNotFoundError:
+            return None
+        with fio:
+            with h5py.File(fio, "r") as template:
+                start_time = float(template.attrs["pointing_start_time"])
+                times = numpy.asarray(template.attrs["pointing_times"], dtype=numpy.float64)
+                rawpart_count = int(template.attrs["pointing_rawpart_count"])
+                template_bfr5_filepath = str(template.attrs["pointing_bfr5_filepath"])
+            if len(inputs) > rawpart_count:
+                logger.info(f"The pointing's BFR5 covers {rawpart_count} rawparts, not {len(inputs)}: regenerating.")
+                return None
+            # the template is in use
+            os.utime(template_filepath)
+
+            start_offset = _raw_start_time(hdr) - start_time
+            if start_offset == 0 and os.path.exists(template_bfr5_filepath):
+                logger.info(f"Reusing the pointing's BFR5 as it stands: {template_bfr5_filepath}")
+                return template_bfr5_filepath
+
+            bfr5_filepath = _batch_bfr5_filepath(os.path.dirname(template_bfr5_filepath), inputs)
+            fio.seek(0)
+            with open(bfr5_filepath, "wb") as bfr5_fio:
+                shutil.copyfileobj(fio, bfr5_fio)
+
+        with h5py.File(bfr5_filepath, "a") as bfr5:
+            for name in _POINTING_BFR5_ATTRS:
+                bfr5.attrs.pop(name, None)
+        bfr5_aux.write_bfr5_delays(
+            bfr5_filepath,
+            times=times + start_offset,
+            **bfr5_aux.read_bfr5_geometry(bfr5_filepath)
+        )
+    except Exception as err:
+        logger.warning(f"Not reusing the pointing's BFR5 for '{inputs[0]}', generating it: {err}")
+        return None
+    logger.info(f"Reused the pointing's BFR5, shifted by {start_offset} s: {bfr5_filepath}")
+    return bfr5_filepath
+
+
+def _registry_key(argstr, inputs):
+    """
+    Returns the registry key of the batch's BFR5: its (obsid, time range,
+    beam set), the beam set being determined by the stage arguments and
+    the time range by the start and rawpart count of the batch. The
+    subband is not part of the key, the targets, beaminfo and delayinfo
+    being independent of frequency: instances of other subbands adapt the
+    published BFR5 (see `_adapt_subband_bfr5`). The spacing of the
+    arguments is not part of the key either.
+    """
+    hdr = _read_raw_header(inputs[0])
+    key = (
+        _raw_obsid(hdr, inputs[0]),
+        _raw_start_time(hdr),
+        len(inputs),
+        " ".join(argstr.split())
+    )
+    return f"{NAME}:registry:{hashlib.sha256(repr(key).encode()).hexdigest()[:32]}"
+
+
+def _record_subband_bfr5(bfr5_filepath, hdr):
+    """
+    Records the subband of the header in the BFR5's attributes, for
+    `_adapt_subband_bfr5`. Returns bfr5_filepath.
+    """
+    with h5py.File(bfr5_filepath, "a") as bfr5:
+        for key in SUBBAND_HEADER_KEYS:
+            bfr5.attrs[f"subband_{key}"] = hdr[key]
+    return bfr5_filepath
+
+
+def _adapt_subband_bfr5(bfr5_filepath, hdr):
+    """
+    Rewrites the subband-specific obsinfo and calinfo of a BFR5 generated
+    for another subband (as recorded by `_record_subband_bfr5`) for the
+    header's subband. The channel frequencies (obsinfo/freq_array, in the
+    file's units) are mapped from the recorded subband onto the header's.
+    The calibration is kept if it is uniform over the channels (as it is
+    without calibration), it cannot be derived for other channels
+    otherwise.
+
+    Raises
+    ------
+        ValueError: if the BFR5 cannot be adapted, for the BFR5 to be generated instead
+    """
+    subband = {key: hdr[key] for key in SUBBAND_HEADER_KEYS}
+    with h5py.File(bfr5_filepath, "a") as bfr5:
+        recorded = {key: bfr5.attrs.get(f"subband_{key}", None) for key in SUBBAND_HEADER_KEYS}
+        if any(value is None for value in recorded.values()):
+            raise ValueError(f"The subband of '{bfr5_filepath}' is not recorded.")
+        if recorded == subband:
+            return
+        nchan = recorded["OBSNCHAN"]
+        if nchan != subband["OBSNCHAN"]:
+            raise ValueError(f"The subband of '{bfr5_filepath}' has {nchan} channels, not {subband['OBSNCHAN']}.")
+
+        for name, dataset in bfr5.get("calinfo", {}).items():
+            calibration = dataset[()]
+            for axis in range(numpy.ndim(calibration)):
+                if calibration.shape[axis] == nchan and not (calibration == numpy.take(calibration, [0], axis=axis)).all():
+                    raise ValueError(f"The calibration 'calinfo/{name}' of '{bfr5_filepath}' varies over its channels.")
+
+        frequencies = bfr5["obsinfo"]["freq_array"][()]
+        # the subband's channels are centred on OBSFREQ
+        unit = numpy.mean(frequencies)/recorded["OBSFREQ"]
+        _hdf5_replace_dataset(
+            bfr5["obsinfo"], "freq_array",
+            data=unit*(subband["OBSFREQ"] + (frequencies/unit - recorded["OBSFREQ"])*subband["OBSBW"]/recorded["OBSBW"])
         )
+        for key in SUBBAND_HEADER_KEYS:
+            bfr5.attrs[f"subband_{key}"] = subband[key]
+
+
+def _hdf5_replace_dataset(group, name, **kwargs):
+    if name in group:
+        del group[name]
+    return group.create_dataset(name, **kwargs)
+
+
+def registered_bfr5(
+    redis_obj,
+    registry_key,
+    generate,
+    local_filepath,
+    shared_dirpath,
+    adapt = None,
+    wait_timeout_s = BFR5_REGISTRY_WAIT_TIMEOUT_S,
+    claim_ttl_s = BFR5_REGISTRY_CLAIM_TTL_S,
+    result_ttl_s = BFR5_REGISTRY_RESULT_TTL_S,
+    logger=None
+):
+    """
+    Returns the BFR5 filepath of the registry_key, deduplicating its
+    generation across instances through Redis:
+        - a BFR5 already published under the key is copied to local_filepath
+          and handed to adapt(local_filepath) (if given), to adapt it to
+          the instance,
+        - otherwise the first instance to claim the key calls generate(),
+          copies its BFR5 into shared_dirpath and publishes that filepath
+          under the key,
+        - other instances wait for the publication, for up to wait_timeout_s.
+    The shared_dirpath must be accessible to every instance using the
+    registry (shared storage, across hosts).
+    Instances fall back to generate() when Redis errs, the wait times out,
+    the claim lapses without a publication (the claimant failed, or
+    exceeded claim_ttl_s), the published BFR5 is not accessible or adapt
+    raises. Only `get`, `set`, `exists` and `delete` of redis_obj are used.
+    """
+    if logger is None:
+        logger = logging.getLogger(NAME)
+    claim_key = f"{registry_key}:claim"
+    result_key = f"{registry_key}:result"
+    claimant = f"{socket.gethostname()}:{os.getpid()}"
+
+    try:
+        shared_filepath = redis_obj.get(result_key)
+        claimed = False
+        if shared_filepath is None:
+            claimed = redis_obj.set(claim_key, claimant, nx=True, ex=claim_ttl_s)
+            if not claimed:
+                logger.info(f"Waiting for the BFR5 of '{registry_key}' claimed by {redis_obj.get(claim_key)}.")
+                wait_for_redis_key(
+                    redis_obj,
+                    result_key,
+                    timeout_s=wait_timeout_s,
+                    while_key=claim_key,
+                    logger=logger
+                )
+                shared_filepath = redis_obj.get(result_key)
+    except (redis.RedisError, TimeoutError) as err:
+        logger.warning(f"BFR5 registry unavailable, generating locally: {err}")
+        return generate()
+
+    if not claimed:
+        if shared_filepath is None:
+            logger.warning(f"The claim of '{registry_key}' lapsed unpublished, generating locally.")
+            return generate()
+        if isinstance(shared_filepath, bytes):
+            shared_filepath = shared_filepath.decode()
+        if not os.path.exists(shared_filepath):
+            logger.warning(f"The published BFR5 '{shared_filepath}' is not accessible, generating locally.")
+            return generate()
+        if os.path.abspath(shared_filepath) != os.path.abspath(local_filepath):
+            shutil.copyfile(shared_filepath, local_filepath)
+        if adapt is not None:
+            try:
+                adapt(local_filepath)
+            except Exception as err:
+                logger.warning(f"The published BFR5 '{shared_filepath}' could not be adapted, generating locally: {err}")
+                return generate()
+        logger.info(f"Reusing the published BFR5 '{shared_filepath}'.")
+        return local_filepath
+
+    try:
+        bfr5_filepath = generate()
+    except BaseException:
+        try:
+            if redis_obj.get(claim_key) in [claimant, claimant.encode()]:
+                redis_obj.delete(claim_key)
+        except redis.RedisError:
+            pass
+        raise
+
+    os.makedirs(shared_dirpath, exist_ok=True)
+    shared_filepath = os.path.join(shared_dirpath, f"{registry_key.split(':')[-1]}.bfr5")
+    shutil.copyfile(bfr5_filepath, shared_filepath)
+    try:
+        redis_obj.set(result_key, shared_filepath, ex=result_ttl_s)
+        logger.info(f"Published the BFR5 of '{registry_key}': {shared_filepath}")
+    except redis.RedisError as err:
+        logger.warning(f"Could not publish the BFR5 of '{registry_key}': {err}")
+    return bfr5_filepath
+
+
+def retroactive_setup_for_target_gen(arg_values, inputs, logger=None, targets_timeout_s=TARGETS_WAIT_TIMEOUT_S):
+    # creates telinfo file, requests targets and manipulates arg_values
+    parser = entrypoints._base_arguments_parser()
+    entrypoints._add_arguments_targetselector(parser)
+    entrypoints._add_arguments_beams(parser)
+    arg_namespace = parser.parse_args(arg_values+inputs)
+
+    rawfile_dir, rawfile_name = os.path.split(inputs[0])
+
+    hdr = _read_raw_header(inputs[0])
+    obsid = _raw_obsid(hdr, inputs[0])
+
+    obsmeta_filepath = f"/home/cosmic/dev/logs/obs_meta/{obsid}_metadata.json"
+    telinfo_output_path = os.path.join(rawfile_dir, f"{obsid}.telinfo.toml")
+
+    _setup_telinfo(obsid, obsmeta_filepath, telinfo_output_path, logger=logger)
     
     # issue a single set of targets based on OBSSTART
     pktindex = hdr.get("SYNCTIME", 0) + hdr[arg_namespace.targets_redis_key_timestamp_rawkey]
@@ -134,19 +645,32 @@ def retroactive_setup_for_target_gen(arg_values, inputs, logger=None):
         hdr.declination_degrees,
         hdr.observed_frequency,
     )
-    if logger is not None:
-        logger.debug(f"Requesting targets from the target-selector: '{target_selector_request}'")
-
-
-    redis_obj = redis.Redis(host=arg_namespace.redis_hostname, port=arg_namespace.redis_port)
-    redis_obj.publish(
-        "target-selector:new-pointing",
-        target_selector_request
+    targets_redis_key_prefix = "targets:VLA-COSMIC:offline_array"
+    redis_obj = _get_redis(arg_namespace.redis_hostname, arg_namespace.redis_port)
+    # requested once per pointing, whether ahead (see `prepare`) or by any instance
+    if redis_obj.set(
+        f"{targets_redis_key_prefix}:{pktindex}:requested",
+        target_selector_request,
+        nx=True,
+        ex=max(1, int(targets_timeout_s))
+    ):
+        if logger is not None:
+            logger.debug(f"Requesting targets from the target-selector: '{target_selector_request}'")
+        redis_obj.publish(
+            "target-selector:new-pointing",
+            target_selector_request
+        )
+    elif logger is not None:
+        logger.debug(f"Targets already requested from the target-selector: '{target_selector_request}'")
+    wait_for_redis_key(
+        redis_obj,
+        f"{targets_redis_key_prefix}:{pktindex}",
+        timeout_s=targets_timeout_s,
+        logger=logger
     )
-    time.sleep(1)
     argstr_value_additions = [
         "-t", telinfo_output_path,
-        "--targets-redis-key-prefix", "targets:VLA-COSMIC:offline_array",
+        "--targets-redis-key-prefix", targets_redis_key_prefix,
         "--targets-redis-key-timestamp", str(pktindex)
     ]
     if logger is not None:
@@ -154,6 +678,40 @@ def retroactive_setup_for_target_gen(arg_values, inputs, logger=None):
     arg_values += argstr_value_additions
 
 
+def registry_enabled(env):
+    """
+    Returns whether the environment configures a BFR5 registry (both
+    BFR5_REGISTRY_REDIS and BFR5_REGISTRY_SHARED_DIRECTORY).
+    """
+    env_dict = common.env_str_to_dict(env)
+    return (
+        env_dict.get("BFR5_REGISTRY_REDIS", None) is not None
+        and env_dict.get("BFR5_REGISTRY_SHARED_DIRECTORY", None) is not None
+    )
+
+
+def _generate(argstr, inputs, env_dict, logger):
+    arg_values = common.split_argument_string(argstr)
+    logger.debug(f"arg_values: {arg_values}")
+    arg_values += inputs
+
+    if any(arg in arg_values for arg in ['--take-targets', '--target']):
+        if env_dict.get("RETROACTIVE_MODE", None) is not None:
+            logger.info("Retroactive setup...")
+            retroactive_setup_for_target_gen(
+                arg_values,
+                inputs,
+                logger=logger,
+                targets_timeout_s=float(env_dict.get("TARGETS_WAIT_TIMEOUT_S", TARGETS_WAIT_TIMEOUT_S))
+            )
+
+        return entrypoints.generate_targets_for_raw(arg_values)
+    elif any(arg in arg_values for arg in ['--raster-ra']):
+        return entrypoints.generate_raster_for_raw(arg_values)
+    else:
+        return entrypoints.generate_for_raw(arg_values)
+
+
 def run(argstr, inputs, env, logger=None):
     if logger is None:
         logger = logging.getLogger(NAME)
@@ -173,21 +731,113 @@ def run(argstr, inputs, env, logger=None):
     for handler in logger.handlers:
         bfr5genie.logger.addHandler(handler)
 
-    arg_values = common.split_argument_string(argstr)
-    logger.debug(f"arg_values: {arg_values}")
-    arg_values += inputs
+    env_dict = common.env_str_to_dict(env)
+    pointing_reuse = env_dict.get("POINTING_BFR5_REUSE", "false").lower() == "true"
+    pointing_cache_dirpath = env_dict.get(
+        "POINTING_BFR5_CACHE_DIRECTORY",
+        os.path.join(tempfile.gettempdir(), "bfr5_pointing_cache")
+    )
+    if pointing_reuse:
+        bfr5_filepath = _reuse_pointing_bfr5(argstr, inputs, pointing_cache_dirpath, logger)
+        if bfr5_filepath is not None:
+            return [bfr5_filepath]
 
-    if any(arg in arg_values for arg in ['--take-targets', '--target']):
-        env_dict = common.env_str_to_dict(env)
-        if env_dict.get("RETROACTIVE_MODE", None) is not None:
-            logger.info("Retroactive setup...")
-            retroactive_setup_for_target_gen(arg_values, inputs, logger=logger)
+    generate = lambda: _generate(argstr, inputs, env_dict, logger)
+    registry_key = None
+    registry_shared_dirpath = env_dict.get("BFR5_REGISTRY_SHARED_DIRECTORY", None)
+    if (registry_redis := env_dict.get("BFR5_REGISTRY_REDIS", None)) is not None:
+        if registry_shared_dirpath is None:
+            logger.warning("The BFR5 registry needs a BFR5_REGISTRY_SHARED_DIRECTORY to publish to, generating locally.")
+        else:
+            try:
+                registry_key = _registry_key(argstr, inputs)
+                hdr = _read_raw_header(inputs[0])
+            except Exception as err:
+                logger.warning(f"No BFR5 registry key for '{inputs[0]}', generating locally: {err}")
+                registry_key = None
 
-        return [entrypoints.generate_targets_for_raw(arg_values)]
-    elif any(arg in arg_values for arg in ['--raster-ra']):
-        return [entrypoints.generate_raster_for_raw(arg_values)]
+    if registry_key is not None:
+        # host:port
+        registry_host, registry_port = registry_redis.rsplit(":", 1)
+        bfr5_filepath = registered_bfr5(
+            _get_redis(registry_host, int(registry_port)),
+            registry_key,
+            lambda: _record_subband_bfr5(generate(), hdr),
+            _batch_bfr5_filepath(os.path.dirname(inputs[0]), inputs),
+            registry_shared_dirpath,
+            adapt=lambda bfr5_filepath: _adapt_subband_bfr5(bfr5_filepath, hdr),
+            wait_timeout_s=float(env_dict.get("BFR5_REGISTRY_WAIT_TIMEOUT_S", BFR5_REGISTRY_WAIT_TIMEOUT_S)),
+            claim_ttl_s=int(env_dict.get("BFR5_REGISTRY_CLAIM_TTL_S", BFR5_REGISTRY_CLAIM_TTL_S)),
+            logger=logger
+        )
     else:
-        return [entrypoints.generate_for_raw(arg_values)]
+        bfr5_filepath = generate()
+
+    if pointing_reuse:
+        _store_pointing_bfr5(argstr, inputs, bfr5_filepath, pointing_cache_dirpath, logger)
+    return [bfr5_filepath]
+
+def prepare(argstr, inputs, env, logger=None, header_timeout_s=600.0):
+    """
+    Prepares the static data of the batch of inputs ahead of `run`, from
+    the header of its first rawpart alone, so as soon as a recording
+    starts: in retroactive mode the telinfo file is written and the
+    targets are requested from the target-selector (and awaited), which
+    `run` then finds unchanged and already present respectively. Waits up
+    to header_timeout_s for the header to be readable.
+
+    Return
+    ------
+        bool: whether there was static data to prepare
+    """
+    if logger is None:
+        logger = logging.getLogger(NAME)
+    env_dict = common.env_str_to_dict(env)
+
+    arg_values = common.split_argument_string(argstr) + inputs
+    if (
+        env_dict.get("RETROACTIVE_MODE", None) is None
+        or not any(arg in arg_values for arg in ['--take-targets', '--target'])
+    ):
+        return False
+
+    start = time.monotonic()
+    while True:
+        try:
+            _read_raw_header(inputs[0])
+            break
+        except Exception as err:
+            if time.monotonic() - start > header_timeout_s:
+                raise TimeoutError(f"The header of '{inputs[0]}' was not readable within {header_timeout_s} s: {err}")
+            time.sleep(0.5)
+
+    retroactive_setup_for_target_gen(
+        arg_values,
+        inputs,
+        logger=logger,
+        targets_timeout_s=float(env_dict.get("TARGETS_WAIT_TIMEOUT_S", TARGETS_WAIT_TIMEOUT_S))
+    )
+    return True
+
+
+def speculate(argstr, inputs, env, logger=None):
+    """
+    Generates and publishes the BFR5 of the batch of inputs ahead of `run`,
+    through the BFR5 registry (see `registry_enabled`), so that `run` (in
+    any process, on any host) finds it ready or claimed. The inputs must be
+    complete. Without a registry, there is no hand-off to `run` and nothing
+    is generated.
+
+    Return
+    ------
+        the BFR5 filepath, or None without a registry
+    """
+    if logger is None:
+        logger = logging.getLogger(NAME)
+    if not registry_enabled(env):
+        return None
+    return run(argstr, inputs, env, logger=logger)[0]
+
 
 if __name__ == "__main__":
     import sys
@@ -0,0 +1,381 @@
+import os, sys, argparse, time, json, csv
+import resource
+import tracemalloc
+
+import numpy
+import pyproj
+import erfa
+import astropy.constants as const
+from astropy.coordinates import SkyCoord
+import astropy.units as units
+from astropy.time import Time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import bfr5_aux
+
+# VLA site (degrees, metres)
+VLA_LONGITUDE = -107.6177275
+VLA_LATITUDE = 34.0787491666667
+VLA_ALTITUDE = 2124.0
+
+GOLDEN_FILEPATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_bfr5_aux_golden.npz")
+# the golden case: small enough to store, large enough to exercise every
+# axis, with enough times over more than 10 minutes for the interpolation
+# to take effect and the astrometry to be refreshed
+GOLDEN_CASE = {"beams": 3, "antennas": 27, "channels": 32, "times": 64, "timestep_s": 10.0}
+# the phasors are stored for these antennas (the reference and the arms'
+# outermost) and channels (the edges of both coarse channels) only, over
+# every beam, time and polarization: the delays they are synthesized
+# from are stored in full
+GOLDEN_PHASOR_ANTENNAS = [0, 8, 17, 26]
+GOLDEN_PHASOR_CHANNELS = [0, 15, 16, 31]
+# option sets benchmarked alongside the default, with the absolute
+# tolerances each is held to against the golden (delays_ns, phasors)
+PHASOR_VARIANTS = {
+    "exp": ({}, (1e-9, 1e-9)),
+    "recurrence": ({"phasorSynthesis": "recurrence"}, (1e-9, 1e-9)),
+    "complex64": ({"phasorDtype": numpy.complex64}, (1e-9, 1e-6)),
+    "refresh_600s": ({"astrometryRefreshInterval_s": 600.0}, (1e-4, 1e-2)),
+    "interpolated_1e-3ns": ({"delayInterpolationMaxError_ns": 1e-3}, (1e-3, 1e-1)),
+}
+
+
+def vla_like_antenna_positions(nAntennas):
+    """Returns ECEF antenna positions (metres) along the three arms of a
+    VLA-like Y, spaced by a power-law out to 21 km as in the A configuration.
+    """
+    armAzimuths = numpy.radians([355.0, 115.0, 236.0])
+    perArm = -(-nAntennas // 3)
+    armRadii = 21000.0 * (numpy.arange(1, perArm + 1) / perArm)**1.716
+    east = (numpy.sin(armAzimuths)[:, None] * armRadii).ravel()[:nAntennas]
+    north = (numpy.cos(armAzimuths)[:, None] * armRadii).ravel()[:nAntennas]
+    up = numpy.zeros(nAntennas)
+
+    lon, lat = numpy.radians(VLA_LONGITUDE), numpy.radians(VLA_LATITUDE)
+    enuToEcef = numpy.array([
+        [-numpy.sin(lon), -numpy.sin(lat)*numpy.cos(lon), numpy.cos(lat)*numpy.cos(lon)],
+        [numpy.cos(lon), -numpy.sin(lat)*numpy.sin(lon), numpy.cos(lat)*numpy.sin(lon)],
+        [0.0, numpy.cos(lat), numpy.sin(lat)],
+    ])
+    centre = numpy.array(
+        bfr5_aux._get_geocentric_transformer().transform(VLA_LONGITUDE, VLA_LATITUDE, VLA_ALTITUDE)
+    )
+    return numpy.stack([east, north, up], axis=-1) @ enuToEcef.T + centre
+
+
+def synthetic_inputs(beams, antennas, channels, times, timestep_s=2.0, seed=0):
+    """Returns the keyword arguments of `bfr5_aux.phasors` for a synthetic
+    VLA-like observation: beams scattered around a fixed boresight, 1 MHz
+    coarse channels of 16 fine channels at 3 GHz and timestep_s timesteps.
+    """
+    rng = numpy.random.default_rng(seed)
+    antennaPositions = vla_like_antenna_positions(antennas)
+    bfr5_aux.transform_antenna_positions_xyz_to_ecef(
+        VLA_LONGITUDE, VLA_LATITUDE, VLA_ALTITUDE, antennaPositions
+    )
+    boresight = SkyCoord(83.63308*units.deg, 22.01450*units.deg)
+    beamCoordinates = SkyCoord(
+        boresight.ra + rng.uniform(-0.25, 0.25, beams)*units.deg,
+        boresight.dec + rng.uniform(-0.25, 0.25, beams)*units.deg,
+    )
+    fineChannels = min(16, channels)
+    coarseChannels = channels // fineChannels
+    calibration = (
+        rng.normal(size=(coarseChannels, 2, antennas))
+        + 1j*rng.normal(size=(coarseChannels, 2, antennas))
+    )
+    return {
+        "antennaPositions": antennaPositions,
+        "boresightCoordinate": boresight,
+        "beamCoordinates": beamCoordinates,
+        "times": 1.7e9 + numpy.arange(times)*timestep_s,
+        # GHz, as the delays are in nanoseconds
+        "frequencies": 3.0 + numpy.arange(channels)*(1e-3/fineChannels),
+        "calibrationCoefficients": calibration,
+        "lla": (numpy.radians(VLA_LONGITUDE), numpy.radians(VLA_LATITUDE), VLA_ALTITUDE),
+    }
+
+
+def measure(func, repeats=1):
+    """Returns the result of the last call, the best wall time (s), the
+    peak traced allocation (MiB) and the process's peak RSS (MiB).
+    """
+    elapsed = numpy.inf
+    tracemalloc.start()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return result, elapsed, peak/(1024*1024), maxrss/1024
+
+
+def benchmark_case(case, repeats, variants):
+    inputs = synthetic_inputs(**case)
+    records = []
+
+    def record(function, variant, elapsed, peak, maxrss):
+        records.append({
+            "function": function,
+            "variant": variant,
+            **case,
+            "elapsed_s": elapsed,
+            "peak_traced_MiB": peak,
+            "maxrss_MiB": maxrss,
+        })
+
+    ecefPositions = vla_like_antenna_positions(case["antennas"])
+    _, *stats = measure(
+        lambda: bfr5_aux.transform_antenna_positions_xyz_to_ecef(
+            VLA_LONGITUDE, VLA_LATITUDE, VLA_ALTITUDE, ecefPositions.copy()
+        ),
+        repeats
+    )
+    record("transform_antenna_positions_xyz_to_ecef", "", *stats)
+
+    bfr5_aux._get_astrom.cache_clear()
+    _, *stats = measure(
+        lambda: bfr5_aux._compute_uvw(
+            Time(inputs["times"][0], format="unix"),
+            inputs["beamCoordinates"],
+            inputs["antennaPositions"],
+            inputs["lla"],
+        ),
+        repeats
+    )
+    record("_compute_uvw", "", *stats)
+
+    for variant in variants:
+        kwargs, _ = PHASOR_VARIANTS[variant]
+        bfr5_aux._get_astrom.cache_clear()
+        _, *stats = measure(lambda: bfr5_aux.phasors(**inputs, **kwargs), repeats)
+        record("phasors", variant, *stats)
+
+    return records
+
+
+def reference_antenna_positions(antennaPositions):
+    """Subtracts the telescope centre from each antenna, one at a time."""
+    transformer = pyproj.Proj.from_proj(
+        pyproj.Proj(proj='latlong', ellps='WGS84', datum='WGS84'),
+        pyproj.Proj(proj='geocent', ellps='WGS84', datum='WGS84'),
+    )
+    telescopeCenterXyz = transformer.transform(VLA_LONGITUDE, VLA_LATITUDE, VLA_ALTITUDE)
+    antennaPositions = antennaPositions.copy()
+    for i in range(antennaPositions.shape[0]):
+        antennaPositions[i, :] -= telescopeCenterXyz
+    return antennaPositions
+
+
+def reference_uvw(ts, source, antennaPositions, lla):
+    """Computes the UVW (metres) of each antenna towards the source at ts,
+    an antenna at a time, from a fresh eraASTROM context.
+    """
+    astrom, eo = erfa.apco13(ts.jd, 0, 0.0, *lla, 0, 0, 0, 0, 0, 0)
+    ri, di = erfa.atciq(source.ra.rad, source.dec.rad, 0, 0, 0, 0, astrom)
+    aob, zob, ha_rad, dec_rad, rob = erfa.atioq(ri, di, astrom)
+    sin_long_minus_hangle = numpy.sin(lla[0]-ha_rad)
+    cos_long_minus_hangle = numpy.cos(lla[0]-ha_rad)
+    sin_declination = numpy.sin(dec_rad)
+    cos_declination = numpy.cos(dec_rad)
+
+    uvws = numpy.zeros(antennaPositions.shape, dtype=numpy.float64)
+    for ant in range(antennaPositions.shape[0]):
+        # RotZ(long-ha) anti-clockwise
+        x = cos_long_minus_hangle*antennaPositions[ant, 0] - (-sin_long_minus_hangle)*antennaPositions[ant, 1]
+        y = (-sin_long_minus_hangle)*antennaPositions[ant, 0] + cos_long_minus_hangle*antennaPositions[ant, 1]
+        z = antennaPositions[ant, 2]
+        # RotY(declination) clockwise
+        x_ = x
+        x = cos_declination*x_ + sin_declination*z
+        z = -sin_declination*x_ + cos_declination*z
+        # Permute (WUV) to (UVW)
+        uvws[ant] = (y, z, x)
+    return uvws
+
+
+def reference_outputs(case=GOLDEN_CASE):
+    """Returns the golden outputs of the case from an element-wise loop,
+    independent of the vectorized `bfr5_aux`: every time, beam, antenna and
+    channel is computed on its own, from a fresh eraASTROM context.
+    """
+    inputs = synthetic_inputs(**case)
+    antennaPositions = inputs["antennaPositions"]
+    beamCoordinates = inputs["beamCoordinates"]
+    times = inputs["times"]
+    frequencies = inputs["frequencies"]
+    calibration = inputs["calibrationCoefficients"]
+    lla = inputs["lla"]
+    nBeam, nAnt, nChan, nTime, nPol = (
+        len(beamCoordinates), antennaPositions.shape[0], frequencies.shape[0], times.shape[0], calibration.shape[1]
+    )
+    ratio = nChan // calibration.shape[0]
+
+    delays_ns = numpy.zeros((nTime, nBeam, nAnt), dtype=numpy.float64)
+    phasors = numpy.zeros(
+        (nBeam, len(GOLDEN_PHASOR_ANTENNAS), len(GOLDEN_PHASOR_CHANNELS), nTime, nPol),
+        dtype=numpy.complex128
+    )
+    for t, tval in enumerate(times):
+        ts = Time(tval, format='unix')
+        boresightUvw = reference_uvw(ts, inputs["boresightCoordinate"], antennaPositions, lla)
+        boresightUvw -= boresightUvw[0:1, :]
+        for b in range(nBeam):
+            beamUvw = reference_uvw(ts, beamCoordinates[b], antennaPositions, lla)
+            beamUvw -= beamUvw[0:1, :]
+            delays_ns[t, b, :] = (beamUvw[:, 2] - boresightUvw[:, 2]) * (1e9 / const.c.value)
+            for i, a in enumerate(GOLDEN_PHASOR_ANTENNAS):
+                for j, f in enumerate(GOLDEN_PHASOR_CHANNELS):
+                    phasor = numpy.exp(
+                        -1.0j*2.0*numpy.pi*delays_ns[t, b, a]*(frequencies[f] - frequencies[0])
+                        - 1.0j*2.0*numpy.pi*delays_ns[t, b, a]*frequencies[0]
+                    )
+                    for p in range(nPol):
+                        phasors[b, i, j, t, p] = phasor*calibration[f // ratio, p, a]
+
+    return {
+        "antenna_positions": reference_antenna_positions(vla_like_antenna_positions(nAnt)),
+        "uvw": numpy.stack([
+            reference_uvw(Time(times[0], format="unix"), beamCoordinates[b], antennaPositions, lla)
+            for b in range(nBeam)
+        ]),
+        "delays_ns": delays_ns,
+        "phasors": phasors,
+    }
+
+
+def golden_outputs(variant="exp"):
+    kwargs, _ = PHASOR_VARIANTS[variant]
+    inputs = synthetic_inputs(**GOLDEN_CASE)
+    phasors, delays_ns = bfr5_aux.phasors(**inputs, **kwargs)
+    antennaPositions = vla_like_antenna_positions(GOLDEN_CASE["antennas"])
+    bfr5_aux.transform_antenna_positions_xyz_to_ecef(
+        VLA_LONGITUDE, VLA_LATITUDE, VLA_ALTITUDE, antennaPositions
+    )
+    uvw = bfr5_aux._compute_uvw(
+        Time(inputs["times"][0], format="unix"),
+        inputs["beamCoordinates"],
+        inputs["antennaPositions"],
+        inputs["lla"],
+    )
+    return {
+        "antenna_positions": antennaPositions,
+        "uvw": uvw,
+        "delays_ns": delays_ns,
+        "phasors": phasors[:, GOLDEN_PHASOR_ANTENNAS][:, :, GOLDEN_PHASOR_CHANNELS],
+    }
+
+
+def check_golden(golden_filepath, variants):
+    """Returns whether every variant's outputs agree with the golden
+    outputs, printing the maximum absolute difference of each.
+    """
+    golden = numpy.load(golden_filepath)
+    agreed = True
+    for variant in variants:
+        _, (delayTolerance, phasorTolerance) = PHASOR_VARIANTS[variant]
+        tolerances = {
+            "antenna_positions": 1e-6,
+            "uvw": 1e-6,
+            "delays_ns": delayTolerance,
+            "phasors": phasorTolerance,
+        }
+        outputs = golden_outputs(variant)
+        for name, value in outputs.items():
+            atol = tolerances[name]
+            difference = numpy.max(numpy.abs(value - golden[name]))
+            agrees = difference <= atol
+            agreed &= agrees
+            print(f"{variant:>20} {name:>18}: max |difference| {difference:.3e} (tolerance {atol:.0e}) {'ok' if agrees else 'FAILED'}")
+    return agreed
+
+
+parser = argparse.ArgumentParser(
+    description="Benchmark bfr5_aux against a synthetic VLA-like observation, checking its outputs against stored golden outputs.",
+    formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+)
+parser.add_argument(
+    "--beams", type=int, nargs="+", default=[1, 8, 64],
+    help="The numbers of beams to scale through."
+)
+parser.add_argument(
+    "--antennas", type=int, nargs="+", default=[27, 54],
+    help="The numbers of antennas to scale through."
+)
+parser.add_argument(
+    "--channels", type=int, nargs="+", default=[256, 1024],
+    help="The numbers of (fine) frequency channels to scale through."
+)
+parser.add_argument(
+    "--times", type=int, nargs="+", default=[4, 32],
+    help="The numbers of timesteps to scale through."
+)
+parser.add_argument(
+    "--base-case", type=int, nargs=4, default=[8, 27, 256, 4],
+    metavar=("BEAMS", "ANTENNAS", "CHANNELS", "TIMES"),
+    help="The case each axis is scaled from."
+)
+parser.add_argument(
+    "--variants", type=str, nargs="+", default=list(PHASOR_VARIANTS.keys()),
+    choices=list(PHASOR_VARIANTS.keys()),
+    help="The phasor option sets to benchmark and check."
+)
+parser.add_argument(
+    "--repeats", type=int, default=3,
+    help="The number of repeats of each measurement, the best of which is recorded."
+)
+parser.add_argument(
+    "--output", type=str, default="bfr5_aux_benchmark.json",
+    help="The results filepath, written as CSV if it ends in '.csv', otherwise as JSON."
+)
+parser.add_argument(
+    "--golden", type=str, default=GOLDEN_FILEPATH,
+    help="The golden outputs filepath."
+)
+parser.add_argument(
+    "--update-golden", action="store_true",
+    help="Regenerate the golden outputs (from the element-wise reference loop) instead of checking against them."
+)
+parser.add_argument(
+    "--skip-benchmark", action="store_true",
+    help="Only check (or update) the golden outputs."
+)
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    if args.update_golden:
+        numpy.savez_compressed(args.golden, **reference_outputs())
+        print(f"Wrote golden outputs to {args.golden}")
+        golden_agreed = True
+    else:
+        golden_agreed = check_golden(args.golden, args.variants)
+
+    if not args.skip_benchmark:
+        baseCase = dict(zip(["beams", "antennas", "channels", "times"], args.base_case))
+        cases = [baseCase]
+        for axis in ["beams", "antennas", "channels", "times"]:
+            for value in getattr(args, axis):
+                case = {**baseCase, axis: value}
+                if case not in cases:
+                    cases.append(case)
+
+        records = []
+        for case in cases:
+            caseRecords = benchmark_case(case, args.repeats, args.variants)
+            for caseRecord in caseRecords:
+                print(", ".join(f"{key}: {value:0.4g}" if isinstance(value, float) else f"{key}: {value}" for key, value in caseRecord.items()))
+            records += caseRecords
+
+        with open(args.output, "w") as fio:
+            if args.output.endswith(".csv"):
+                writer = csv.DictWriter(fio, fieldnames=list(records[0].keys()))
+                writer.writeheader()
+                writer.writerows(records)
+            else:
+                json.dump(records, fio, indent=2)
+        print(f"Wrote {len(records)} results to {args.output}")
+
+    sys.exit(0 if golden_agreed else 1)
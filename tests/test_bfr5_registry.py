@@ -0,0 +1,209 @@
+import os, sys
+import threading
+import time
+
+import pytest
+
+for module in ["redis", "h5py", "bfr5genie", "guppi", "Pypeline"]:
+    pytest.importorskip(module)
+import redis
+import h5py
+import numpy
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import stage_bfr5_generate
+
+
+class RedisStandIn:
+    """The part of redis.Redis used by `registered_bfr5`, in memory."""
+    def __init__(self, fail=False):
+        self.values = {}
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def _check(self):
+        if self.fail:
+            raise redis.exceptions.ConnectionError("stand-in is down")
+
+    def get(self, key):
+        self._check()
+        return self.values.get(key)
+
+    def exists(self, key):
+        self._check()
+        return key in self.values
+
+    def delete(self, key):
+        self._check()
+        self.values.pop(key, None)
+
+    def set(self, key, value, nx=False, ex=None):
+        self._check()
+        with self._lock:
+            if nx and key in self.values:
+                return None
+            self.values[key] = value
+            return True
+
+
+def header(**overrides):
+    hdr = {
+        "OBSID": "obs1",
+        "OBSFREQ": 3000.0,
+        "OBSBW": 64.0,
+        "SCHAN": 0,
+        "OBSNCHAN": 64,
+        "TBIN": 1e-6,
+        "PKTNTIME": 32,
+        "PKTIDX": 0,
+        "SYNCTIME": 1.7e9,
+    }
+    hdr.update(overrides)
+    return {key: value for key, value in hdr.items() if value is not None}
+
+
+def generator(tmp_path, name, generated, delay_s=0.2, fail=False):
+    def generate():
+        time.sleep(delay_s)
+        generated.append(name)
+        if fail:
+            raise RuntimeError(f"{name} failed")
+        os.makedirs(tmp_path / name, exist_ok=True)
+        filepath = tmp_path / name / "generated.bfr5"
+        filepath.write_text(name)
+        return str(filepath)
+    return generate
+
+
+def run_instances(redis_obj, tmp_path, failing=()):
+    generated = []
+    results = {}
+
+    def instance(name):
+        os.makedirs(tmp_path / name, exist_ok=True)
+        try:
+            results[name] = stage_bfr5_generate.registered_bfr5(
+                redis_obj,
+                "bfr5_generate:registry:test",
+                generator(tmp_path, name, generated, fail=name in failing),
+                str(tmp_path / name / "local.bfr5"),
+                shared_dirpath=str(tmp_path / "shared"),
+                wait_timeout_s=5.0,
+            )
+        except RuntimeError as err:
+            results[name] = err
+
+    threads = []
+    for name in ["a", "b"]:
+        threads.append(threading.Thread(target=instance, args=(name,)))
+        threads[-1].start()
+        # "a" claims first
+        time.sleep(0.05)
+    for thread in threads:
+        thread.join()
+    return results, generated
+
+
+def test_registry_generates_once(tmp_path):
+    results, generated = run_instances(RedisStandIn(), tmp_path)
+    assert generated == ["a"]
+    assert results["a"] == str(tmp_path / "a" / "generated.bfr5")
+    assert results["b"] == str(tmp_path / "b" / "local.bfr5")
+    assert open(results["b"]).read() == "a"
+
+
+def test_registry_waiter_generates_when_claimant_fails(tmp_path):
+    results, generated = run_instances(RedisStandIn(), tmp_path, failing=["a"])
+    assert isinstance(results["a"], RuntimeError)
+    assert generated == ["a", "b"]
+    assert open(results["b"]).read() == "b"
+
+
+def test_registry_unavailable_generates_locally(tmp_path):
+    results, generated = run_instances(RedisStandIn(fail=True), tmp_path)
+    assert sorted(generated) == ["a", "b"]
+    assert open(results["b"]).read() == "b"
+
+
+def test_registry_key_is_shared_by_subbands(monkeypatch):
+    headers = {}
+    monkeypatch.setattr(stage_bfr5_generate, "_read_raw_header", lambda filepath: headers[filepath])
+    headers["ac.raw"] = header()
+    headers["bd.raw"] = header(OBSFREQ=5000.0)
+    headers["upper.raw"] = header(SCHAN=64)
+    headers["later.raw"] = header(PKTIDX=1024)
+
+    keys = [
+        stage_bfr5_generate._registry_key("--take-targets 5", [filepath])
+        for filepath in ["ac.raw", "bd.raw", "upper.raw", "later.raw"]
+    ]
+    assert keys[0] == keys[1] == keys[2] != keys[3]
+    assert stage_bfr5_generate._registry_key("--take-targets  5", ["ac.raw"]) == keys[0]
+
+
+def subband_bfr5(filepath, hdr, calibration):
+    with h5py.File(filepath, "w") as bfr5:
+        nchan = hdr["OBSNCHAN"]
+        # GHz channel centres
+        bfr5["obsinfo/freq_array"] = (hdr["OBSFREQ"] + (numpy.arange(nchan) + 0.5 - nchan/2)*hdr["OBSBW"]/nchan)/1e3
+        bfr5["calinfo/cal_all"] = calibration
+        bfr5["delayinfo/delays"] = numpy.ones((4, 2, 3))
+    return stage_bfr5_generate._record_subband_bfr5(str(filepath), hdr)
+
+
+def test_adapt_subband_bfr5(tmp_path):
+    ac, bd = header(), header(OBSFREQ=5000.0, OBSBW=-64.0)
+    expected = subband_bfr5(tmp_path / "expected.bfr5", bd, numpy.ones((64, 2, 3)))
+
+    adapted = subband_bfr5(tmp_path / "adapted.bfr5", ac, numpy.ones((64, 2, 3)))
+    stage_bfr5_generate._adapt_subband_bfr5(adapted, bd)
+    with h5py.File(adapted) as bfr5, h5py.File(expected) as reference:
+        assert numpy.allclose(bfr5["obsinfo/freq_array"][:], reference["obsinfo/freq_array"][:])
+        assert bfr5.attrs["subband_OBSFREQ"] == 5000.0
+        assert (bfr5["delayinfo/delays"][:] == 1).all()
+
+    calibrated = subband_bfr5(tmp_path / "calibrated.bfr5", ac, numpy.arange(64*2*3).reshape(64, 2, 3))
+    with pytest.raises(ValueError):
+        stage_bfr5_generate._adapt_subband_bfr5(calibrated, bd)
+    # unchanged for its own subband
+    stage_bfr5_generate._adapt_subband_bfr5(calibrated, ac)
+
+
+def test_registry_generates_when_unadaptable(tmp_path):
+    generated = []
+    redis_obj = RedisStandIn()
+    shared = str(tmp_path / "shared")
+    for name in ["a", "b"]:
+        os.makedirs(tmp_path / name)
+    stage_bfr5_generate.registered_bfr5(
+        redis_obj, "bfr5_generate:registry:test", generator(tmp_path, "a", generated, delay_s=0),
+        str(tmp_path / "a" / "local.bfr5"), shared
+    )
+
+    def adapt(filepath):
+        raise ValueError("another subband")
+    result = stage_bfr5_generate.registered_bfr5(
+        redis_obj, "bfr5_generate:registry:test", generator(tmp_path, "b", generated, delay_s=0),
+        str(tmp_path / "b" / "local.bfr5"), shared, adapt=adapt
+    )
+    assert generated == ["a", "b"]
+    assert open(result).read() == "b"
+
+
+def test_run_generates_locally_without_registry_key(monkeypatch, tmp_path):
+    # neither PKTNTIME nor the fields of the block-size derivation
+    monkeypatch.setattr(stage_bfr5_generate, "_read_raw_header", lambda filepath: header(PKTNTIME=None))
+    monkeypatch.setattr(stage_bfr5_generate, "_get_redis", lambda host, port: RedisStandIn())
+    generated = []
+    monkeypatch.setattr(
+        stage_bfr5_generate, "_generate",
+        lambda argstr, inputs, env_dict, logger: generator(tmp_path, "local", generated, delay_s=0)()
+    )
+
+    outputs = stage_bfr5_generate.run(
+        "--take-targets 5",
+        [str(tmp_path / "obs1.AC.C000.0000.raw")],
+        f"BFR5_REGISTRY_REDIS=localhost:6379 BFR5_REGISTRY_SHARED_DIRECTORY={tmp_path / 'shared'}"
+    )
+    assert generated == ["local"]
+    assert outputs == [str(tmp_path / "local" / "generated.bfr5")]
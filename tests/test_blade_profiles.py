@@ -0,0 +1,77 @@
+import os, random, sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import blade_profiles
+
+# profiles as written by tests/profile_beamformsearch.py (at -C 1 -N 1),
+# the last having run out of GPU memory
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "blade_profiles_sample.csv")
+
+
+@pytest.fixture
+def profiles():
+    return blade_profiles.load_profiles(SAMPLE_CSV)
+
+
+def test_fit_covers_successful_profiles(profiles):
+    model = blade_profiles.BladeMemoryModel.fit(profiles)
+    assert (model.coefficients >= 0).all()
+    for profile in profiles:
+        if not profile["successful"]:
+            continue
+        assert model.predict(profile["chanrate"], profile["bfrate"], profile["number_of_beams"]) >= profile["gpu_memuse_MiB"]
+
+
+def test_workers_scale_the_buffers(profiles):
+    model = blade_profiles.BladeMemoryModel.fit(profiles, margin_fraction=0.0)
+    model.margin_MiB = 0.0
+    constant, per_sample, per_beam_sample = model.coefficients
+    samples = 131072*32
+
+    single = model.predict(131072, 32, 17)
+    assert model.predict(131072, 32, 17, workers=2) - single == pytest.approx(
+        samples*(per_sample + 17*per_beam_sample), abs=1
+    )
+    assert model.predict(131072, 16, 17, coarse_channels=2) == single
+
+
+def test_largest_bfrate_fits_the_workers(profiles):
+    model = blade_profiles.BladeMemoryModel.fit(profiles)
+    memory_MiB = model.predict(131072, 32, 17)
+
+    assert model.largest_bfrate(131072, 17, memory_MiB, 64) == 32
+    assert model.largest_bfrate(131072, 17, memory_MiB, 64, workers=2) == 16
+    assert model.largest_bfrate(131072, 17, 100, 64) is None
+
+
+def test_record_profile_extends_an_earlier_store(tmp_path):
+    store = tmp_path / "autotune.csv"
+    earlier_headers = [header for header in blade_profiles.TUNING_HEADERS if header != "outputs"]
+    store.write_text(",".join(earlier_headers) + "\n" + ",".join("1" for _ in earlier_headers) + "\n")
+
+    blade_profiles.record_profile(str(store), {header: 2 for header in blade_profiles.TUNING_HEADERS})
+
+    profiles = blade_profiles.load_profiles(str(store))
+    assert [profile["outputs"] for profile in profiles] == [None, 2]
+    assert [profile["workers"] for profile in profiles] == [1, 2]
+
+
+def test_tune_parameters_explores_per_host():
+    def profile(bfrate, elapsed_s, hostname):
+        return {
+            "chanrate": 131072, "bfrate": bfrate, "number_of_beams": 17, "elapsed_s": elapsed_s,
+            "successful": True, "coarse_channels": 1, "workers": 1, "input_bytes": 1024,
+            "hostname": hostname,
+        }
+    profiles = [profile(16, 10.0, "this"), profile(8, 20.0, "this"), profile(32, 5.0, "other")]
+
+    # bfrate 32 was only tried on another host, so it is untried on this one
+    for seed in range(8):
+        (parameters, explored) = blade_profiles.tune_parameters(
+            profiles, 17, (131072, 16, 1, 1), bfrates=[8, 16, 32], explore=1.0,
+            hostname="this", rng=random.Random(seed),
+        )
+        assert explored
+        assert parameters == (131072, 32, 1, 1)
@@ -0,0 +1,130 @@
+import os, sys, json
+import multiprocessing
+import textwrap
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import gpu_lease
+
+# answers the device and process queries of gpu_lease from a JSON state file:
+# {"devices": [[index, total MiB, free MiB], ...], "processes": {pid: used MiB}}
+FAKE_NVIDIA_SMI = textwrap.dedent("""
+    import sys, json
+    state = json.load(open(sys.argv[1]))
+    if "--query-gpu=index,memory.total,memory.free" in sys.argv:
+        for device in state["devices"]:
+            print(", ".join(str(value) for value in device))
+    elif "--query-compute-apps=pid,used_memory" in sys.argv:
+        for pid, used in state["processes"].items():
+            print(f"{pid}, {used}")
+    else:
+        sys.exit(1)
+""")
+
+
+class FakeNvidiaSmi:
+    def __init__(self, dirpath, devices, processes=None):
+        self.script = os.path.join(dirpath, "fake-nvidia-smi.py")
+        self.state = os.path.join(dirpath, "fake-nvidia-smi.json")
+        with open(self.script, "w") as fio:
+            fio.write(FAKE_NVIDIA_SMI)
+        self.update(devices, processes)
+
+    def update(self, devices, processes=None):
+        with open(self.state, "w") as fio:
+            json.dump({"devices": devices, "processes": processes or {}}, fio)
+
+    @property
+    def command(self):
+        return f"{sys.executable} {self.script} {self.state}"
+
+    def manager(self, directory):
+        return gpu_lease.GpuLeaseManager(
+            directory=directory,
+            query_devices=lambda: gpu_lease.query_nvidia_smi(self.command),
+            query_processes=lambda: gpu_lease.query_nvidia_smi_processes(self.command),
+        )
+
+
+def test_claims_count_until_allocated(tmp_path):
+    # 80 GiB device, 20 GiB used outside of leases
+    smi = FakeNvidiaSmi(tmp_path, [[0, 81920, 61440]])
+    manager = smi.manager(tmp_path / "leases")
+
+    lease_a = manager.acquire(30720)
+    lease_a.set_process(4242)
+    lease_b = manager.acquire(30720)
+    assert manager.available_memory() == {0: 61440 - 2*30720}
+
+    # A's process allocates its claim, B's has yet to
+    smi.update([[0, 81920, 61440 - 30720]], {4242: 30720})
+    assert manager.available_memory() == {0: 0}
+    with pytest.raises(TimeoutError):
+        manager.acquire(20480)
+
+    # B's process allocates half its claim
+    lease_b.set_process(4343)
+    smi.update([[0, 81920, 61440 - 30720 - 15360]], {4242: 30720, 4343: 15360})
+    assert manager.available_memory() == {0: 0}
+
+    lease_a.release()
+    lease_b.release()
+    smi.update([[0, 81920, 61440]])
+    assert manager.acquire(20480).index == 0
+
+
+def test_leases_spread_over_devices(tmp_path):
+    smi = FakeNvidiaSmi(tmp_path, [[0, 16000, 15000], [1, 16000, 15500]])
+    manager = smi.manager(tmp_path / "leases")
+
+    with manager.acquire(6000) as first, manager.acquire(6000) as second:
+        assert (first.index, second.index) == (1, 0)
+        assert manager.available_memory() == {0: 9000, 1: 9500}
+        with manager.acquire(9000, candidate_indices=[0]) as third:
+            assert third.index == 0
+            assert manager.available_memory() == {0: 0, 1: 9500}
+    assert os.listdir(tmp_path / "leases") == ["manager.lock"]
+
+
+def _acquire_and_exit(directory, command, memory_MiB, results, done):
+    manager = gpu_lease.GpuLeaseManager(
+        directory=directory,
+        query_devices=lambda: gpu_lease.query_nvidia_smi(command),
+        query_processes=lambda: gpu_lease.query_nvidia_smi_processes(command),
+    )
+    try:
+        lease = manager.acquire(memory_MiB)
+        results.put(True)
+    except TimeoutError:
+        results.put(False)
+    done.wait()
+    # exits holding any lease, unreleased
+
+
+def test_concurrent_leases_do_not_overcommit(tmp_path):
+    smi = FakeNvidiaSmi(tmp_path, [[0, 16000, 15000]])
+    directory = str(tmp_path / "leases")
+    smi.manager(directory)
+
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    done = context.Event()
+    processes = [
+        context.Process(target=_acquire_and_exit, args=(directory, smi.command, 4000, results, done), daemon=True)
+        for _ in range(6)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        # 15000 MiB fits 3 of 4000 MiB
+        assert sorted(results.get(timeout=30) for _ in processes) == [False]*3 + [True]*3
+    finally:
+        done.set()
+        for process in processes:
+            process.join()
+
+    # the holders have exited, so their leases are stale
+    manager = smi.manager(directory)
+    assert manager.available_memory() == {0: 15000}
+    assert [filename for filename in os.listdir(directory) if "lease" in filename] == []